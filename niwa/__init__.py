@@ -1,12 +1,41 @@
 """niwa - Auto-split package"""
 
+from importlib import import_module
 from importlib.metadata import version as _pkg_version
 __version__ = _pkg_version("niwa")
 
-from .niwa import Niwa
-from .cli import main
-from .models import ConflictType, Edit, ConflictAnalysis, EditResult
-from .command import COMMAND_HELP, print_command_help
-from .core import generate_claude_hooks_config, get_niwa_usage_guide, handle_hook_event, setup_claude_hooks, LLM_SYSTEM_PROMPT, ERROR_PROMPTS, print_error
+# Public names are resolved on first access (PEP 562) so that `niwa help`,
+# `niwa setup` and `niwa hook` don't import lmdb, markdown-it and tiktoken.
+_EXPORTS = {
+    'Niwa': '.niwa',
+    'main': '.cli',
+    'ConflictType': '.models',
+    'Edit': '.models',
+    'ConflictAnalysis': '.models',
+    'EditResult': '.models',
+    'COMMAND_HELP': '.command',
+    'print_command_help': '.command',
+    'generate_claude_hooks_config': '.core',
+    'get_niwa_usage_guide': '.core',
+    'handle_hook_event': '.core',
+    'setup_claude_hooks': '.core',
+    'LLM_SYSTEM_PROMPT': '.core',
+    'ERROR_PROMPTS': '.core',
+    'print_error': '.core',
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
 
 __all__ = ['Niwa', 'main', 'ConflictType', 'Edit', 'ConflictAnalysis', 'EditResult', 'COMMAND_HELP', 'print_command_help', 'generate_claude_hooks_config', 'get_niwa_usage_guide', 'handle_hook_event', 'setup_claude_hooks', 'LLM_SYSTEM_PROMPT', 'ERROR_PROMPTS', 'print_error', '__version__']
@@ -0,0 +1,28 @@
+"""niwa.agents - Agent name utilities."""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Letters, digits, underscore, hyphen. fullmatch (unlike `^...$`) also
+# rejects a trailing newline.
+_AGENT_NAME_RE = re.compile(r'[a-zA-Z0-9_-]{1,50}')
+
+
+@lru_cache(maxsize=128)
+def validate_agent_name(agent_id: str) -> Tuple[bool, str]:
+    """Validate agent name - no special chars that could cause issues.
+
+    Pure function of the name, so results are cached and the CLI can check
+    --agent before opening the database.
+    """
+    if agent_id != "default_agent" and _AGENT_NAME_RE.fullmatch(agent_id):
+        return True, "OK"
+    # Slow path: work out which rule was broken
+    if not agent_id:
+        return False, "Agent name cannot be empty"
+    if len(agent_id) > 50:
+        return False, "Agent name too long (max 50 chars)"
+    if agent_id == "default_agent":
+        return False, "Please specify a unique agent name with --agent"
+    return False, "Agent name can only contain letters, numbers, underscore, hyphen"
@@ -1,238 +1,159 @@
 """niwa.cli - Auto-split module"""
 
+import json
 import os
 from pathlib import Path
 import sys
+import time
 import argparse
-from datetime import datetime
+from itertools import islice
+from typing import Optional, Tuple
 
 from . import __version__
-from .command import print_command_help
-from .core import LLM_SYSTEM_PROMPT, handle_hook_event, print_error, setup_claude_hooks
-from .models import ConflictAnalysis, ConflictType
-from .niwa import Niwa
-from .tokens import count_tokens
+from .paths import db_exists
 
 
-def main():
+# The database stack (lmdb, markdown-it, tiktoken) is imported inside the
+# code paths that need it, so help/setup/hook don't pay for it.
+def __getattr__(name):
+    # Keeps `from niwa.cli import Niwa` working
+    if name == 'Niwa':
+        from .niwa import Niwa
+        return Niwa
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    COMMANDS_HELP = """
-commands:
-  init                  Initialize a new database
-  load <file>           Load markdown file into database
-  add <title> [content] Add a node directly (--parent, --file, --stdin)
-  tree                  Show document structure with node IDs
-  read <id>             Read for editing (--all, --section N, --lines M-N)
-  edit <id> <content>   Edit a node's content
-  resolve <id> <type>   Resolve a conflict (ACCEPT_YOURS|ACCEPT_THEIRS|MANUAL_MERGE)
-  search <query>        Search content by keyword
-  history <id>          View version history of a node
-  rollback <id> <ver>   Restore node to previous version
-  export                Export database back to markdown
-  status                Check agent's pending reads/conflicts
-  conflicts             List unresolved conflicts for agent
-  agents                List all agents who've used this database
-  whoami                Get suggested unique agent name
-  check                 Verify database health
-  cleanup               Remove stale pending reads/conflicts
-  delete <id>           Delete a node (children reparented to parent)
-  move <id>             Move a node under a different parent (--under)
-  setup <target>        Set up integrations (e.g., 'setup claude')
-  help [command]        Show help (optionally for specific command)
 
-examples:
-  niwa init                              # Initialize database
-  niwa add "Requirements" --agent claude  # Add a node directly
-  niwa tree                              # See structure
-  niwa read h2_3 --agent claude_1        # Read node for editing
-  niwa edit h2_3 "new content" --agent claude_1  # Edit node
-  niwa export > output.md                # Export to markdown
-"""
+# Agent ID recorded for commands run without --agent
+DEFAULT_AGENT = 'default_agent'
 
-    parser = argparse.ArgumentParser(
-        description="Niwa 庭 - Collaborative Markdown Database for LLM Agents",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=COMMANDS_HELP
-    )
-    parser.add_argument('-v', '--version', action='version', version=f'niwa {__version__}')
-    parser.add_argument('command', nargs='?', default='help', metavar='COMMAND',
-                       help='Command to run (see commands below)')
-    parser.add_argument('args', nargs='*', help='Command arguments')
-    parser.add_argument('--agent', default='default_agent', help='Agent ID (use a unique name!)')
-    parser.add_argument('--summary', default=None, help='Edit summary (helps with conflict resolution)')
-    parser.add_argument('--file', default=None, help='Read content from file instead of command line (avoids escaping issues)')
-    parser.add_argument('--stdin', action='store_true', help='Read content from stdin (for piping)')
-    parser.add_argument('--case-sensitive', action='store_true', help='Case-sensitive search')
-    parser.add_argument('--max-age', type=int, default=3600, help='Max age in seconds for cleanup (default 3600)')
-    parser.add_argument('--dry-run', action='store_true', help='Preview edit without applying')
-    parser.add_argument('--parent', default=None, help='Parent node ID for add command (default: root)')
-    parser.add_argument('--all', action='store_true', dest='show_all', help='Show full content even for large nodes')
-    parser.add_argument('--section', type=int, default=None, help='Show specific section number from content structure')
-    parser.add_argument('--lines', default=None, help='Show specific line range (e.g., "1-25")')
-    parser.add_argument('--remove', action='store_true', help='Remove hook configuration (for setup --remove)')
-    parser.add_argument('--global', action='store_true', dest='global_hooks', help='Install hooks globally (~/.claude/settings.json)')
-    parser.add_argument('--under', default=None, help='Target parent node ID for move command')
-    # Hook event handling (called by Claude Code hooks)
-    parser.add_argument('--hook-event', default=None, help='Hook event name (internal use by hooks)')
-    parser.add_argument('--hook-input', default=None, help='Path to hook input JSON file (internal use)')
+# Database commands, filled in by @_command: name -> (handler, required, agent)
+_COMMANDS = {}
 
-    args = parser.parse_args()
+_RULE = "=" * 80
 
-    # Help commands
-    if args.command == 'help':
-        if args.args:
-            print_command_help(args.args[0])
-        else:
-            print(LLM_SYSTEM_PROMPT)
+
+def _command(name: str, required: Tuple = (), agent: bool = False):
+    """Register a database command handler under ``name``.
+
+    ``required`` has one entry per positional argument the command needs:
+    the ERROR_PROMPTS key to show when it's missing (None: just the help).
+    ``agent`` marks commands whose --agent value is validated before the
+    database is opened.
+    """
+    def register(handler):
+        _COMMANDS[name] = (handler, required, agent)
+        return handler
+    return register
+
+
+def _print_guide(args, headline: str):
+    """Print the full usage guide followed by an error headline.
+
+    Skipped with --quiet so scripted callers only get the error box.
+    """
+    if args.quiet:
         return
+    from .core import LLM_SYSTEM_PROMPT
+    sys.stdout.write(f"{LLM_SYSTEM_PROMPT}\n\n{_RULE}\n{headline}\n{_RULE}\n")
 
-    # ==========================================================================
-    # SETUP COMMAND - Doesn't require database
-    # ==========================================================================
-    if args.command == 'setup':
-        if not args.args:
-            print_command_help('setup')
-            print("""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ ERROR: Missing integration target                                         ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ USAGE:                                                                       ║
-║   niwa setup claude     # Set up Claude Code hooks           ║
-║   niwa setup --remove   # Remove hooks (after target)        ║
-║                                                                              ║
-║ SUPPORTED TARGETS:                                                           ║
-║   claude - Claude Code (creates .claude/settings.json)                       ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            return
 
-        target = args.args[0].lower()
+def _print_error(args, error_type: str, context: dict = None):
+    """print_error() that honours --quiet."""
+    from .core import print_error
+    print_error(error_type, context, show_full_guide=not args.quiet)
 
-        if target == 'claude':
-            if args.global_hooks:
-                project_dir = str(Path.home())
-            else:
-                project_dir = os.getcwd()
-            success, message = setup_claude_hooks(project_dir, remove=args.remove)
 
-            if success:
-                if args.remove:
-                    print(f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ✅ CLAUDE CODE HOOKS REMOVED                                                 ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ {message:<76} ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-                else:
-                    print(f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ✅ CLAUDE CODE HOOKS INSTALLED                                               ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ {message:<76} ║
-║                                                                              ║
-║ HOOKS INSTALLED:                                                             ║
-║   • SessionStart - Injects Niwa usage guide + status on session start        ║
-║   • PreCompact   - Preserves Niwa context before context compaction          ║
-║   • PreToolUse   - Warns about conflicts before Write/Edit                   ║
-║   • PostToolUse  - Hints to sync after markdown file changes                 ║
-║   • Stop         - Reminds about unresolved conflicts                        ║
-║                                                                              ║
-║ Claude will remember how to use Niwa even after /compact.                    ║
-║                                                                              ║
-║ TO REMOVE LATER:                                                             ║
-║   niwa setup claude --remove                                                ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            else:
-                print(f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ SETUP FAILED                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ {message:<76} ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            return
-        else:
-            print(f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ UNKNOWN TARGET: {target:<56} ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ SUPPORTED TARGETS:                                                           ║
-║   claude - Claude Code (creates .claude/settings.json)                       ║
-║                                                                              ║
-║ EXAMPLE:                                                                     ║
-║   niwa setup claude                                          ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            return
+def _print_command_help(command: str):
+    """Print one command's help box.
 
-    # ==========================================================================
-    # HOOK COMMAND - Called by Claude Code hooks (internal use)
-    # ==========================================================================
-    if args.command == 'hook':
-        if not args.hook_event:
-            print("Hook event not specified. Use --hook-event <event_name>", file=sys.stderr)
-            sys.exit(1)
+    The help text is only needed on usage errors and `niwa help <cmd>`,
+    so niwa.command is imported on first use rather than at startup.
+    """
+    from .command import print_command_help
+    print_command_help(command)
 
-        # Handle the hook event
-        exit_code = handle_hook_event(args.hook_event)
-        sys.exit(exit_code)
 
-    # Check for database existence for commands that need it
-    db_exists = Path(".niwa/data.lmdb").exists()
+def _print_json(data):
+    """Write ``data`` as one line of JSON (for --json)."""
+    sys.stdout.write(json.dumps(data, default=str) + "\n")
 
-    if args.command != 'init' and not db_exists:
-        print(LLM_SYSTEM_PROMPT)
-        print("\n" + "=" * 80)
-        print("❌ DATABASE NOT INITIALIZED - YOU MUST INITIALIZE FIRST")
-        print("=" * 80)
-        print("""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ DATABASE NOT INITIALIZED                                                  ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ The database doesn't exist yet. You need to initialize it first.             ║
-║                                                                              ║
-║ STEP 1: Initialize                                                           ║
-║   niwa init                                                  ║
-║                                                                              ║
-║ STEP 2: Add nodes to build the tree                                          ║
-║   niwa add "Section Title" --agent <name>                    ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-        return
 
-    db = Niwa()
+def _emit(lines) -> None:
+    """Write what would have been one print() per line in a single call."""
+    sys.stdout.write("\n".join(lines) + "\n")
 
-    # Validate agent name for commands that use it
-    agent_commands = ['read', 'edit', 'resolve', 'status', 'conflicts', 'whoami', 'dry-run', 'rollback', 'add', 'delete', 'move']
-    if args.command in agent_commands and args.agent != 'default_agent':
-        valid, msg = db.validate_agent_name(args.agent)
-        if not valid:
-            print(f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ INVALID AGENT NAME                                                        ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ {msg:<76} ║
-║                                                                              ║
-║ Agent names must:                                                            ║
-║   - Contain only letters, numbers, underscore (_), hyphen (-)                ║
-║   - Be 1-50 characters long                                                  ║
-║   - Not be "default_agent"                                                   ║
-║                                                                              ║
-║ GOOD EXAMPLES: claude_1, researcher_A, agent-42                              ║
-║ BAD EXAMPLES: "my agent", agent@1, agent/sub                                 ║
-║                                                                              ║
-║ Get a suggested name: niwa whoami                            ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            db.close()
-            return
 
+_TS_FULL = '%Y-%m-%d %H:%M:%S'
+_TS_MINUTE = '%Y-%m-%d %H:%M'
+_TS_SHORT = '%m-%d %H:%M'
+_TS_CLOCK = '%H:%M:%S'
+
+
+def _ts(t: float, fmt: str = _TS_FULL) -> str:
+    """Format a unix timestamp in local time (no datetime object per row)."""
+    return time.strftime(fmt, time.localtime(t))
+
+
+def _fit(value, width: int, limit: Optional[int] = None) -> str:
+    """Truncate ``value`` to ``limit`` chars (default ``width``) and left-pad to ``width``."""
+    return '%-*.*s' % (width, width if limit is None else limit, value)
+
+
+def _preview(s: str, n: int) -> str:
+    """First ``n`` chars of ``s`` with an ellipsis if cut, or ``(empty)``."""
+    if not s:
+        return '(empty)'
+    return s if len(s) <= n else s[:n] + '...'
+
+
+def _read_stdin() -> str:
+    """Read all of stdin as raw bytes and decode it in one pass."""
     try:
-        if args.command == 'init':
-            if db_exists:
-                print("""
+        fd = sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        return sys.stdin.read()
+    chunks = []
+    while True:
+        chunk = os.read(fd, 1 << 20)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    text = b"".join(chunks).decode(sys.stdin.encoding or 'utf-8', sys.stdin.errors or 'strict')
+    if os.name == 'nt':
+        # Match the universal-newline translation sys.stdin does on Windows
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _read_content(args, index: int) -> Tuple[Optional[str], Optional[str]]:
+    """Get command content from --file, --stdin or positional arg ``index``.
+
+    Returns (content, error). content is None when no source was given;
+    error carries the reason when --file could not be read.
+    """
+    if args.file:
+        try:
+            with open(args.file, 'rb', buffering=1 << 20) as f:
+                text = f.read().decode('utf-8')
+        except Exception as e:
+            return None, str(e)
+        if '\r' in text:
+            # Same newline handling as a text-mode open()
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text, None
+    if args.stdin:
+        return _read_stdin(), None
+    if len(args.args) > index:
+        return args.args[index], None
+    return None, None
+
+
+@_command('init')
+def _cmd_init(args, db):
+    """Initialize a new database."""
+    # create_node refuses to overwrite, so an existing root means an existing DB
+    if not db.create_node('root', 'root', 'Document', '', 0, None, 'system'):
+        print("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ℹ️  DATABASE ALREADY EXISTS                                                   ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -244,9 +165,8 @@ examples:
 ║   - Start fresh: rm -rf .niwa && niwa init                   ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            else:
-                db.create_node('root', 'root', 'Document', '', 0, None, 'system')
-                print("""
+    else:
+        print("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ DATABASE INITIALIZED                                                      ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -261,19 +181,18 @@ examples:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'load':
-            if not args.args:
-                print_error('no_file')
-                return
-            md_file = args.args[0]
-            if not Path(md_file).exists():
-                print(LLM_SYSTEM_PROMPT)
-                print("\n" + "=" * 80)
-                print("❌ FILE NOT FOUND")
-                print("=" * 80)
-                print(f"""
+
+@_command('load', required=('no_file',))
+def _cmd_load(args, db):
+    """Load a markdown file into the database."""
+    md_file = args.args[0]
+    try:
+        root_id = db.load_markdown(md_file)
+    except FileNotFoundError:
+        _print_guide(args, "❌ FILE NOT FOUND")
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ FILE NOT FOUND: {md_file[:50]:<56} ║
+║ ❌ FILE NOT FOUND: {_fit(md_file, 56, 50)} ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ The specified file doesn't exist.                                            ║
 ║                                                                              ║
@@ -282,14 +201,13 @@ examples:
 ║   - Is the filename spelled correctly?                                       ║
 ║   - Are you in the right directory?                                          ║
 ║                                                                              ║
-║ Current directory: {os.getcwd()[:56]:<56} ║
+║ Current directory: {_fit(os.getcwd(), 56)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                return
-            root_id = db.load_markdown(md_file)
-            print(f"✅ Loaded {md_file}\n")
-            print(db.get_tree())
-            print(f"""
+        return
+    print(f"✅ Loaded {md_file}\n")
+    print(db.get_tree())
+    print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ NEXT STEPS:                                                                  ║
 ║   niwa tree                  # View structure anytime        ║
@@ -297,30 +215,18 @@ examples:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'add':
-            if not args.args:
-                print("""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ MISSING TITLE                                                            ║
-╠══════════════════════════════════════════════════════════════════════════════╣
-║ USAGE:                                                                      ║
-║   niwa add "Section Title"                          # Add under root        ║
-║   niwa add "Subsection" --parent h1_0               # Add under parent      ║
-║   niwa add "Section" "content here"                 # With inline content   ║
-║   niwa add "Section" --file content.md              # Content from file     ║
-║   niwa add "Section" --stdin                        # Content from stdin    ║
-║   niwa add "Section" --agent alice                  # Specify agent         ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-                return
 
-            title = args.args[0]
+@_command('add', required=('no_title',), agent=True)
+def _cmd_add(args, db):
+    """Add a node directly."""
+    agent = args.agent_id
+    title = args.args[0]
 
-            # Determine parent
-            parent_id = args.parent if args.parent else 'root'
-            parent_node = db.read_node(parent_id)
-            if not parent_node:
-                print(f"""
+    # Determine parent
+    parent_id = args.parent if args.parent else 'root'
+    parent_node, existing, node_id = db.prepare_add(parent_id, title)
+    if not parent_node:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ PARENT NODE NOT FOUND                                                    ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -329,37 +235,30 @@ examples:
 ║ Run 'niwa tree' to see available node IDs.                                  ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                return
+        return
 
-            # Determine content
-            content = ''
-            if args.file:
-                try:
-                    with open(args.file, 'r') as f:
-                        content = f.read()
-                except Exception as e:
-                    print(f"""
+    # Determine content
+    content, error = _read_content(args, 1)
+    if error is not None:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ CANNOT READ FILE                                                         ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ {str(e)[:76]:<76} ║
+║ {_fit(error, 76)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                    return
-            elif args.stdin:
-                content = sys.stdin.read()
-            elif len(args.args) >= 2:
-                content = args.args[1]
-
-            # Check for duplicate title under same parent
-            existing = db.find_child_by_title(parent_id, title)
-            if existing:
-                ex_id = existing['id']
-                ex_agent = existing.get('last_agent', 'unknown')
-                ex_ver = existing.get('version', 1)
-                ex_content = existing.get('content', '')
-                ex_preview = ex_content[:60] + ('...' if len(ex_content) > 60 else '') if ex_content else '(empty)'
-                print(f"""
+        return
+    if content is None:
+        content = ''
+
+    # Check for duplicate title under same parent
+    if existing:
+        ex_id = existing['id']
+        ex_agent = existing.get('last_agent', 'unknown')
+        ex_ver = existing.get('version', 1)
+        ex_content = existing.get('content', '')
+        ex_preview = _preview(ex_content, 60)
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ⚠️  DUPLICATE TITLE DETECTED                                                ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -367,40 +266,39 @@ examples:
 ║                                                                              ║
 ║ EXISTING NODE:                                                               ║
 ║   ID:      {ex_id:<64} ║
-║   Title:   {existing.get('title', '')[:64]:<64} ║
+║   Title:   {_fit(existing.get('title', ''), 64)} ║
 ║   Agent:   {ex_agent:<64} ║
 ║   Version: {str(ex_ver):<64} ║
-║   Content: {ex_preview[:64]:<64} ║
+║   Content: {_fit(ex_preview, 64)} ║
 ║                                                                              ║
 ║ OPTIONS:                                                                     ║
 ║   1. Edit existing: niwa read {ex_id} --agent <name>           ║
 ║   2. Use a different title                                                   ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                print(f"EXISTING_NODE_ID: {ex_id}")
-                return
+        print(f"EXISTING_NODE_ID: {ex_id}")
+        return
 
-            # Infer level from parent
-            level = parent_node.get('level', 0) + 1
-
-            # Generate next sequential node ID
-            node_id = db.next_node_id(level)
-
-            agent_id = args.agent
-            success = db.create_node(node_id, 'heading', title, content, level, parent_id, agent_id)
-
-            if success:
-                print(f"✅ Created node '{node_id}' under '{parent_id}'\n")
-                print(f"   Title: {title}")
-                if content:
-                    preview = content[:80] + ('...' if len(content) > 80 else '')
-                    print(f"   Content: {preview}")
-                print(f"   Level: {level}")
-                print(f"   Agent: {agent_id}\n")
-                print(f"NODE_ID: {node_id}\n")
-                print(db.get_tree())
-            else:
-                print(f"""
+    # Infer level from parent (node_id was generated for this level)
+    level = parent_node.get('level', 0) + 1
+
+    agent_id = agent
+    success = db.create_node(node_id, 'heading', title, content, level, parent_id, agent_id)
+
+    if success:
+        print(f"✅ Created node '{node_id}' under '{parent_id}'\n")
+        print(f"   Title: {title}")
+        if content:
+            print(f"   Content: {_preview(content, 80)}")
+        print(f"   Level: {level}")
+        print(f"   Agent: {agent_id}\n")
+        print(f"NODE_ID: {node_id}\n")
+        if not args.quiet:
+            chain = db.get_ancestor_chain(node_id)
+            print("   Path: " + " > ".join(f"[{n['id']}] {n.get('title', '')}" for n in chain))
+            print("   (run 'niwa tree' for the full structure)")
+    else:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ FAILED TO CREATE NODE                                                    ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -408,10 +306,8 @@ examples:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'tree':
-            tree = db.get_tree()
-            if not tree or tree.strip() == "# Document Structure\n":
-                print("""
+
+_DB_EMPTY = """
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ℹ️  DATABASE IS EMPTY                                                         ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -420,28 +316,37 @@ examples:
 ║ ADD YOUR FIRST NODE:                                                         ║
 ║   niwa add "Section Title" --agent <name>                    ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            else:
-                print(tree)
+"""
 
-        elif args.command == 'read':
-            if not args.args:
-                print_error('no_node_id')
-                print_command_help('read')
-                return
-            node_id = args.args[0]
-            node = db.read_for_edit(node_id, args.agent)
-            if node:
-                tok = count_tokens(node['content'])
-                content = node['content']
-                lines = content.split('\n')
-
-                if args.section is not None:
-                    # Show a specific section
-                    elements = db.content_structure(content)
-                    idx = args.section - 1  # 1-indexed to 0-indexed
-                    if idx < 0 or idx >= len(elements):
-                        print(f"""
+
+@_command('tree')
+def _cmd_tree(args, db):
+    """Show document structure with node IDs."""
+    tree = db.get_tree()
+    if not tree or tree.strip() == "# Document Structure\n":
+        print(_DB_EMPTY)
+    else:
+        print(tree)
+
+
+@_command('read', required=('no_node_id',), agent=True)
+def _cmd_read(args, db):
+    """Read a node for editing."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    node = db.read_for_edit(node_id, agent)
+    if node:
+        from .tokens import count_tokens
+        tok = count_tokens(node['content'])
+        content = node['content']
+        lines = content.split('\n')
+
+        if args.section is not None:
+            # Show a specific section
+            elements = db.content_structure(content)
+            idx = args.section - 1  # 1-indexed to 0-indexed
+            if idx < 0 or idx >= len(elements):
+                print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ INVALID SECTION NUMBER                                                    ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -450,13 +355,13 @@ examples:
 ║ Run without --section to see the structure table.                            ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                    else:
-                        elem = elements[idx]
-                        start = elem['lines'][0]
-                        end = elem['lines'][1]
-                        section_lines = lines[start - 1:end]
-                        section_text = '\n'.join(section_lines)
-                        print(f"""
+            else:
+                elem = elements[idx]
+                start = elem['lines'][0]
+                end = elem['lines'][1]
+                section_lines = lines[start - 1:end]
+                section_text = '\n'.join(section_lines)
+                print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📖 SECTION {args.section} of [{node_id}]{' ' * max(0, 60 - len(str(args.section)) - len(node_id))}║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -471,27 +376,27 @@ CONTENT (lines {start}-{end}):
 ─────────────────────────────────────────────────────────────────────────────────
 """)
 
-                elif args.lines is not None:
-                    # Show a specific line range
-                    try:
-                        parts = args.lines.split('-')
-                        line_start = int(parts[0])
-                        line_end = int(parts[1]) if len(parts) > 1 else line_start
-                    except (ValueError, IndexError):
-                        print(f"""
+        elif args.lines is not None:
+            # Show a specific line range
+            try:
+                parts = args.lines.split('-')
+                line_start = int(parts[0])
+                line_end = int(parts[1]) if len(parts) > 1 else line_start
+            except (ValueError, IndexError):
+                print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ INVALID LINE RANGE                                                        ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Expected format: M-N (e.g., "1-25")                                          ║
-║ Got: {args.lines[:70]:<71} ║
+║ Got: {_fit(args.lines, 71, 70)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                        return
-                    line_start = max(1, line_start)
-                    line_end = min(len(lines), line_end)
-                    selected = lines[line_start - 1:line_end]
-                    selected_text = '\n'.join(selected)
-                    print(f"""
+                return
+            line_start = max(1, line_start)
+            line_end = min(len(lines), line_end)
+            selected = lines[line_start - 1:line_end]
+            selected_text = '\n'.join(selected)
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📖 LINES {line_start}-{line_end} of [{node_id}]{' ' * max(0, 58 - len(str(line_start)) - len(str(line_end)) - len(node_id))}║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -505,19 +410,19 @@ CONTENT (lines {line_start}-{line_end}):
 ─────────────────────────────────────────────────────────────────────────────────
 """)
 
-                elif args.show_all or tok <= db.PROGRESSIVE_READ_THRESHOLD:
-                    # Full content display (small node or --all forced)
-                    print(f"""
+        elif args.show_all or tok <= db.PROGRESSIVE_READ_THRESHOLD:
+            # Full content display (small node or --all forced)
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📖 NODE READ SUCCESSFULLY                                                    ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Node ID: {node_id:<63} ║
 ║ Version: {node['version']:<63} ║
-║ Title: {node.get('title', '(none)')[:61]:<63} ║
+║ Title: {_fit(node.get('title', '(none)'), 63, 61)} ║
 ║ Last edited by: {node.get('last_agent', '?'):<54} ║
 ║ Tokens: ~{tok:,}{' ' * max(0, 66 - len(f"{tok:,}"))}║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ ⚠️  IMPORTANT: Your agent "{args.agent}" is now tracked as reading v{node['version']:<9} ║
+║ ⚠️  IMPORTANT: Your agent "{agent}" is now tracked as reading v{node['version']:<9} ║
 ║    If you edit and someone else edited in between → CONFLICT                 ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
@@ -527,23 +432,23 @@ CONTENT:
 ─────────────────────────────────────────────────────────────────────────────────
 
 NEXT: To edit this node, run:
-  niwa edit {node_id} "<your new content>" --agent {args.agent} --summary "what you changed"
+  niwa edit {node_id} "<your new content>" --agent {agent} --summary "what you changed"
 """)
 
-                else:
-                    # Large node: progressive disclosure — show structure table
-                    elements = db.content_structure(content)
-                    print(f"""
+        else:
+            # Large node: progressive disclosure — show structure table
+            elements = db.content_structure(content)
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📖 NODE READ — LARGE CONTENT                                                ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Node ID: {node_id:<63} ║
 ║ Version: {node['version']:<63} ║
-║ Title: {node.get('title', '(none)')[:61]:<63} ║
+║ Title: {_fit(node.get('title', '(none)'), 63, 61)} ║
 ║ Last edited by: {node.get('last_agent', '?'):<54} ║
 ║ Tokens: ~{tok:,}{' ' * max(0, 66 - len(f"{tok:,}"))}║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ ⚠️  IMPORTANT: Your agent "{args.agent}" is now tracked as reading v{node['version']:<9} ║
+║ ⚠️  IMPORTANT: Your agent "{agent}" is now tracked as reading v{node['version']:<9} ║
 ║    If you edit and someone else edited in between → CONFLICT                 ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
@@ -551,56 +456,47 @@ CONTENT STRUCTURE ({len(elements)} sections, ~{tok:,} tokens total):
 ─────────────────────────────────────────────────────────────────────────────────
  #  │ Type          │ Lines     │ Tokens │ Preview
 ────┼───────────────┼───────────┼────────┼──────────────────────────────────────""")
-                    for i, elem in enumerate(elements, 1):
-                        etype = elem['type'][:13]
-                        erange = f"{elem['lines'][0]}-{elem['lines'][1]}"
-                        etok = elem['tokens']
-                        preview = elem.get('preview', '')[:38]
-                        print(f" {i:<2} │ {etype:<13} │ {erange:<9} │ {etok:>6} │ {preview}")
-                    print(f"""────┴───────────────┴───────────┴────────┴──────────────────────────────────────
+            for i, elem in enumerate(elements, 1):
+                etype = elem['type'][:13]
+                erange = f"{elem['lines'][0]}-{elem['lines'][1]}"
+                etok = elem['tokens']
+                preview = elem.get('preview', '')[:38]
+                print(f" {i:<2} │ {etype:<13} │ {erange:<9} │ {etok:>6} │ {preview}")
+            print(f"""────┴───────────────┴───────────┴────────┴──────────────────────────────────────
 ─────────────────────────────────────────────────────────────────────────────────
 
 TO VIEW CONTENT:
-  niwa read {node_id} --section N --agent {args.agent:<20}  # View one section
-  niwa read {node_id} --lines M-N --agent {args.agent:<19}  # View line range
-  niwa read {node_id} --all --agent {args.agent:<25}  # View full content
+  niwa read {node_id} --section N --agent {agent:<20}  # View one section
+  niwa read {node_id} --lines M-N --agent {agent:<19}  # View line range
+  niwa read {node_id} --all --agent {agent:<25}  # View full content
 """)
-            else:
-                print_error('node_not_found', {'provided_id': node_id})
+    else:
+        _print_error(args, 'node_not_found', {'provided_id': node_id})
 
-        elif args.command == 'edit':
-            if not args.args:
-                print_error('no_node_id')
-                print_command_help('edit')
-                return
 
-            node_id = args.args[0]
-
-            # Get content from: --file, --stdin, or command line arg
-            content = None
-            if args.file:
-                # Read content from file (avoids shell escaping issues!)
-                try:
-                    with open(args.file, 'r') as f:
-                        content = f.read()
-                    print(f"📄 Read content from file: {args.file}")
-                except Exception as e:
-                    print(f"""
+@_command('edit', required=('no_node_id',), agent=True)
+def _cmd_edit(args, db):
+    """Edit a node's content."""
+    agent = args.agent_id
+    node_id = args.args[0]
+
+    # Get content from: --file (avoids shell escaping issues!), --stdin, or command line arg
+    content, error = _read_content(args, 1)
+    if error is not None:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ CANNOT READ FILE: {str(e)[:54]:<54} ║
+║ ❌ CANNOT READ FILE: {_fit(error, 54)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                    return
-            elif args.stdin:
-                # Read content from stdin (for piping)
-                content = sys.stdin.read()
-                print("📄 Read content from stdin")
-            elif len(args.args) >= 2:
-                content = args.args[1]
-            else:
-                print_error('no_content')
-                print_command_help('edit')
-                print("""
+        return
+    if args.file:
+        print(f"📄 Read content from file: {args.file}")
+    elif args.stdin:
+        print("📄 Read content from stdin")
+    elif content is None:
+        _print_error(args, 'no_content')
+        _print_command_help('edit')
+        print("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 💡 TIP: Use --file to avoid shell escaping issues!                           ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -616,13 +512,13 @@ TO VIEW CONTENT:
 ║    cat content.txt | niwa edit h2_3 --stdin --agent me       ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                return
+        return
 
-            # --dry-run flag: preview without applying
-            if args.dry_run:
-                result = db.dry_run_edit(node_id, content, args.agent)
-                if result['would_succeed']:
-                    print(f"""
+    # --dry-run flag: preview without applying
+    if args.dry_run:
+        result = db.dry_run_edit(node_id, content, agent)
+        if result['would_succeed']:
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ DRY RUN: EDIT WOULD SUCCEED                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -632,11 +528,11 @@ TO VIEW CONTENT:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 To actually apply this edit:
-  niwa edit {node_id} {"--file " + args.file if args.file else '"<content>"'} --agent {args.agent}
+  niwa edit {node_id} {"--file " + args.file if args.file else '"<content>"'} --agent {agent}
 """)
-                else:
-                    icon = "⚠️" if result['reason'] == 'conflict' else "❌"
-                    print(f"""
+        else:
+            icon = "⚠️" if result['reason'] == 'conflict' else "❌"
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ {icon} DRY RUN: EDIT WOULD FAIL                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -645,118 +541,107 @@ To actually apply this edit:
 ║ {result['message']:<76} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                    if result['reason'] == 'conflict':
-                        print(f"""
+            if result['reason'] == 'conflict':
+                print(f"""
 You're {result.get('versions_behind', '?')} version(s) behind.
 
 Re-read to get the latest version, then edit:
-  niwa read {node_id} --agent {args.agent}
+  niwa read {node_id} --agent {agent}
 """)
-                return
+        return
 
-            result = db.edit_node(
-                node_id, content, args.agent, args.summary
-            )
+    result = db.edit_node(
+        node_id, content, agent, args.summary
+    )
 
-            if result.success:
-                print(f"""
+    if result.success:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ EDIT SUCCESSFUL                                                           ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ {result.message:<76} ║
-║ Agent: {args.agent:<69} ║
-║ Summary: {(args.summary or '(none)')[:66]:<67} ║
+║ Agent: {agent:<69} ║
+║ Summary: {_fit(args.summary or '(none)', 67, 66)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            elif result.conflict:
-                # Store conflict for sub-agents to retrieve later
-                db.store_conflict(args.agent, result.conflict)
-
-                print("=" * 80)
-                print("⚠️  CONFLICT DETECTED!")
-                print("=" * 80)
-                print(result.conflict.to_llm_prompt())
-                print("=" * 80)
-                print(f"""
+    elif result.conflict:
+        # Store conflict for sub-agents to retrieve later
+        db.store_conflict(agent, result.conflict)
+
+        print("=" * 80)
+        print("⚠️  CONFLICT DETECTED!")
+        print("=" * 80)
+        print(result.conflict.to_llm_prompt())
+        print("=" * 80)
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 💾 CONFLICT STORED - Can be retrieved later with:                            ║
-║    niwa status --agent {args.agent:<37} ║
-║    niwa conflicts --agent {args.agent:<34} ║
+║    niwa status --agent {agent:<37} ║
+║    niwa conflicts --agent {agent:<34} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                print(f"""
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ HOW TO RESOLVE THIS CONFLICT:                                                ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║                                                                              ║
 ║ Option 1 - Use YOUR version (discards their changes):                        ║
-║   niwa resolve {node_id} ACCEPT_YOURS --agent {args.agent:<14} ║
+║   niwa resolve {node_id} ACCEPT_YOURS --agent {agent:<14} ║
 ║                                                                              ║
 ║ Option 2 - Keep THEIR version (discards your changes):                       ║
-║   niwa resolve {node_id} ACCEPT_THEIRS --agent {args.agent:<13} ║
+║   niwa resolve {node_id} ACCEPT_THEIRS --agent {agent:<13} ║
 ║                                                                              ║
 ║ Option 3 - MANUAL MERGE (combine both - RECOMMENDED):                        ║
-║   niwa resolve {node_id} MANUAL_MERGE "<merged>" --agent {args.agent:<5} ║
+║   niwa resolve {node_id} MANUAL_MERGE "<merged>" --agent {agent:<5} ║
 ║                                                                              ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 💡 TIP: MANUAL_MERGE is usually best - it preserves everyone's work!
    Look at both "YOUR CHANGES" and "THEIR CHANGES" above, then combine them.
 """)
-            else:
-                print(f"""
+    else:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ EDIT FAILED                                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ {result.message:<76} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                if "not found" in result.message.lower():
-                    print_error('node_not_found', {'provided_id': node_id})
+        if "not found" in result.message.lower():
+            _print_error(args, 'node_not_found', {'provided_id': node_id})
+
+
+_VALID_RESOLUTIONS = frozenset({'ACCEPT_YOURS', 'ACCEPT_THEIRS', 'MANUAL_MERGE'})
 
-        elif args.command == 'resolve':
-            if not args.args:
-                print_error('no_node_id')
-                print_command_help('resolve')
-                return
-            if len(args.args) < 2:
-                print_error('no_resolution')
-                print_command_help('resolve')
-                return
 
-            node_id = args.args[0]
-            resolution = args.args[1].upper()
-
-            # Get manual_content from: --file, --stdin, or command line arg
-            manual_content = None
-            if resolution == 'MANUAL_MERGE':
-                if args.file:
-                    try:
-                        with open(args.file, 'r') as f:
-                            manual_content = f.read()
-                        print(f"📄 Read merged content from file: {args.file}")
-                    except Exception as e:
-                        print(f"""
+@_command('resolve', required=('no_node_id', 'no_resolution'), agent=True)
+def _cmd_resolve(args, db):
+    """Resolve a stored conflict."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    resolution = args.args[1].upper()
+
+    # Get manual_content from: --file, --stdin, or command line arg
+    manual_content = None
+    if resolution == 'MANUAL_MERGE':
+        manual_content, error = _read_content(args, 2)
+        if error is not None:
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ CANNOT READ FILE: {str(e)[:54]:<54} ║
+║ ❌ CANNOT READ FILE: {_fit(error, 54)} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                        return
-                elif args.stdin:
-                    manual_content = sys.stdin.read()
-                    print("📄 Read merged content from stdin")
-                elif len(args.args) > 2:
-                    manual_content = args.args[2]
-
-            valid_resolutions = ['ACCEPT_YOURS', 'ACCEPT_THEIRS', 'MANUAL_MERGE']
-            if resolution not in valid_resolutions:
-                print(LLM_SYSTEM_PROMPT)
-                print("\n" + "=" * 80)
-                print("❌ INVALID RESOLUTION TYPE")
-                print("=" * 80)
-                print(f"""
+            return
+        if args.file:
+            print(f"📄 Read merged content from file: {args.file}")
+        elif args.stdin:
+            print("📄 Read merged content from stdin")
+
+    if resolution not in _VALID_RESOLUTIONS:
+        _print_guide(args, "❌ INVALID RESOLUTION TYPE")
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ ❌ INVALID RESOLUTION: {resolution[:50]:<53} ║
+║ ❌ INVALID RESOLUTION: {_fit(resolution, 53, 50)} ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Valid options are:                                                           ║
 ║   - ACCEPT_YOURS                                                             ║
@@ -764,15 +649,12 @@ Re-read to get the latest version, then edit:
 ║   - MANUAL_MERGE                                                             ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                print_command_help('resolve')
-                return
+        _print_command_help('resolve')
+        return
 
-            if resolution == 'MANUAL_MERGE' and not manual_content:
-                print(LLM_SYSTEM_PROMPT)
-                print("\n" + "=" * 80)
-                print("❌ MANUAL_MERGE REQUIRES CONTENT")
-                print("=" * 80)
-                print("""
+    if resolution == 'MANUAL_MERGE' and not manual_content:
+        _print_guide(args, "❌ MANUAL_MERGE REQUIRES CONTENT")
+        print("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ MANUAL_MERGE REQUIRES CONTENT                                             ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -793,43 +675,26 @@ Re-read to get the latest version, then edit:
 ║   niwa resolve h2_3 MANUAL_MERGE --file /tmp/merged.md       ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                return
+        return
 
-            # Look up the stored conflict for this agent+node so ACCEPT_YOURS
-            # has access to the conflict data.
-            stored_conflict = None
-            stored_conflicts = db.get_pending_conflicts(args.agent)
-            for sc in stored_conflicts:
-                if sc.get('node_id') == node_id:
-                    stored_conflict = ConflictAnalysis(
-                        conflict_type=ConflictType.TRUE_CONFLICT,
-                        node_id=sc['node_id'],
-                        node_title=sc.get('node_title', ''),
-                        your_base_version=sc.get('your_base_version', 0),
-                        current_version=sc.get('current_version', 0),
-                        concurrent_edits_count=0,
-                        original_content='',
-                        your_content=sc.get('your_content', ''),
-                        current_content=sc.get('current_content', ''),
-                        your_changes=[],
-                        their_changes=[],
-                        overlapping_regions=[],
-                        your_agent_id=args.agent,
-                        other_agents=[],
-                        their_edit_summaries=[],
-                        auto_merge_possible=sc.get('auto_merge_possible', False),
-                        auto_merged_content=sc.get('auto_merged_content'),
-                    )
-                    break
-
-            result = db.resolve_conflict(
-                node_id, resolution, args.agent,
-                manual_content=manual_content,
-                conflict=stored_conflict,
-            )
-
-            if result.success:
-                print(f"""
+    # Look up the stored conflict for this agent+node so ACCEPT_YOURS
+    # has access to the conflict data, and ACCEPT_YOURS / MANUAL_MERGE
+    # are checked against the version the conflict was recorded at.
+    # ACCEPT_THEIRS writes nothing, so it doesn't need it.
+    stored_conflict = None
+    sc = None if resolution == 'ACCEPT_THEIRS' else db.get_pending_conflict(agent, node_id)
+    if sc is not None:
+        from .models import ConflictAnalysis
+        stored_conflict = ConflictAnalysis.from_stored(sc, agent)
+
+    result = db.resolve_conflict(
+        node_id, resolution, agent,
+        manual_content=manual_content,
+        conflict=stored_conflict,
+    )
+
+    if result.success:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ CONFLICT RESOLVED                                                         ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -838,10 +703,10 @@ Re-read to get the latest version, then edit:
 ║ New version: {result.new_version if result.new_version else 'N/A':<63} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                # Clear the stored conflict
-                db.clear_conflict(args.agent, node_id)
-            else:
-                print(f"""
+        # Clear the stored conflict
+        db.clear_conflict(agent, node_id)
+    else:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ RESOLUTION FAILED                                                         ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -849,139 +714,196 @@ Re-read to get the latest version, then edit:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'title':
-            if len(args.args) < 2:
-                print_command_help('title')
-                return
-            node_id = args.args[0]
-            title = args.args[1]
-            result = db.update_title(node_id, title, args.agent)
-            if result.success:
-                print(f"✅ Title updated for {node_id}")
-            else:
-                print(f"❌ {result.message}")
-
-        elif args.command == 'summarize':
-            if len(args.args) < 2:
-                print_command_help('summarize')
-                return
-            node_id = args.args[0]
-            summary = args.args[1]
-            result = db.update_summary(node_id, summary, args.agent)
-            if result.success:
-                print(f"✅ Summary updated for {node_id}")
-            else:
-                print(f"❌ {result.message}")
-
-        elif args.command == 'export':
-            print(db.export_markdown())
 
-        # =====================================================================
-        # AGENT STATUS COMMANDS (critical for sub-agents with fresh context)
-        # =====================================================================
-
-        elif args.command == 'status':
-            status = db.get_agent_status(args.agent)
-            print(f"""
+@_command('title', required=(None, None))
+def _cmd_title(args, db):
+    """Update a node's title."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    title = args.args[1]
+    result = db.update_title(node_id, title, agent)
+    if result.success:
+        print(f"✅ Title updated for {node_id}")
+    else:
+        print(f"❌ {result.message}")
+
+
+@_command('summarize', required=(None, None))
+def _cmd_summarize(args, db):
+    """Update a node's summary."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    summary = args.args[1]
+    result = db.update_summary(node_id, summary, agent)
+    if result.success:
+        print(f"✅ Summary updated for {node_id}")
+    else:
+        print(f"❌ {result.message}")
+
+
+@_command('export')
+def _cmd_export(args, db):
+    """Export the database back to markdown."""
+    # Stream through stdout's buffer; the trailing newline matches print()
+    sys.stdout.writelines(db.iter_export_markdown())
+    sys.stdout.write("\n")
+
+
+# =====================================================================
+# AGENT STATUS COMMANDS (critical for sub-agents with fresh context)
+# =====================================================================
+
+@_command('status', agent=True)
+def _cmd_status(args, db):
+    """Show the agent's pending reads, conflicts and recent edits."""
+    agent = args.agent_id
+    status = db.get_agent_status(agent)
+    if args.json:
+        _print_json(status)
+        return
+    out = []
+    out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📊 AGENT STATUS                                                              ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Agent: {args.agent:<69} ║
+║ Agent: {agent:<69} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            # Pending reads
-            if status['pending_reads']:
-                print("📖 PENDING READS (you read but haven't edited yet):")
-                print("─" * 78)
-                for pr in status['pending_reads']:
-                    stale_warning = ""
-                    if pr['stale']:
-                        stale_warning = f" ⚠️  STALE! (outdated by {pr['stale_by']} version(s))"
-                    print(f"  [{pr['node_id']}] read v{pr['read_version']}, now at v{pr['current_version']}{stale_warning}")
-                print()
-            else:
-                print("📖 No pending reads.\n")
-
-            # Pending conflicts
-            if status['pending_conflicts']:
-                print("⚠️  PENDING CONFLICTS (need resolution!):")
-                print("─" * 78)
-                for pc in status['pending_conflicts']:
-                    auto = "auto-merge available" if pc.get('auto_merge_possible') else "manual merge needed"
-                    print(f"  [{pc['node_id']}] \"{pc.get('node_title', '?')[:40]}\" ({auto})")
-                    print(f"     Your version was based on v{pc.get('your_base_version')}, current is v{pc.get('current_version')}")
-                    print(f"     → Resolve: niwa resolve {pc['node_id']} <RESOLUTION> --agent {args.agent}")
-                print()
-            else:
-                print("✅ No pending conflicts.\n")
-
-            # Recent edits
-            if status['recent_edits']:
-                print("✏️  RECENT EDITS (last hour):")
-                print("─" * 78)
-                for re in status['recent_edits'][:5]:  # Show max 5
-                    ts = datetime.fromtimestamp(re['timestamp']).strftime('%H:%M:%S')
-                    print(f"  [{re['node_id']}] v{re['version']} at {ts}: {re.get('summary', '(no summary)')[:50]}")
-                print()
-
-            # Nodes touched
-            if status['nodes_touched']:
-                print(f"📝 Nodes you've touched: {', '.join(status['nodes_touched'][:10])}")
-                if len(status['nodes_touched']) > 10:
-                    print(f"   ... and {len(status['nodes_touched']) - 10} more")
-
-        elif args.command == 'conflicts':
-            conflicts = db.get_pending_conflicts(args.agent if args.agent != "default_agent" else None)
-
-            if not conflicts:
-                print("""
+    # Pending reads
+    if status['pending_reads']:
+        out.append("📖 PENDING READS (you read but haven't edited yet):")
+        out.append("─" * 78)
+        for pr in status['pending_reads']:
+            stale_warning = ""
+            if pr['stale']:
+                stale_warning = f" ⚠️  STALE! (outdated by {pr['stale_by']} version(s))"
+            out.append(f"  [{pr['node_id']}] read v{pr['read_version']}, now at v{pr['current_version']}{stale_warning}")
+        out.append("")
+    else:
+        out.append("📖 No pending reads.\n")
+
+    # Pending conflicts
+    if status['pending_conflicts']:
+        out.append("⚠️  PENDING CONFLICTS (need resolution!):")
+        out.append("─" * 78)
+        for pc in status['pending_conflicts']:
+            auto = "auto-merge available" if pc.get('auto_merge_possible') else "manual merge needed"
+            out.append(f"  [{pc['node_id']}] \"{pc.get('node_title', '?'):.40}\" ({auto})")
+            out.append(f"     Your version was based on v{pc.get('your_base_version')}, current is v{pc.get('current_version')}")
+            out.append(f"     → Resolve: niwa resolve {pc['node_id']} <RESOLUTION> --agent {agent}")
+        out.append("")
+    else:
+        out.append("✅ No pending conflicts.\n")
+
+    # Recent edits
+    if status['recent_edits']:
+        out.append("✏️  RECENT EDITS (last hour):")
+        out.append("─" * 78)
+        for re in islice(status['recent_edits'], 5):  # Show max 5
+            ts = _ts(re['timestamp'], _TS_CLOCK)
+            out.append(f"  [{re['node_id']}] v{re['version']} at {ts}: {re.get('summary', '(no summary)'):.50}")
+        out.append("")
+
+    # Nodes touched
+    touched = status['nodes_touched']
+    if touched:
+        out.append(f"📝 Nodes you've touched: {', '.join(islice(touched, 10))}")
+        extra = len(touched) - 10
+        if extra > 0:
+            out.append(f"   ... and {extra} more")
+    _emit(out)
+
+
+_CONFLICT_CARD = """
+┌──────────────────────────────────────────────────────────────────────────────┐
+│ Node: [{node_id}] "{title:.50}"
+│ Agent: {agent}
+│ Stored: {stored}
+│ Version conflict: v{base} → v{current} ({auto})
+│
+│ Resolve with:
+│   niwa resolve {node_id} ACCEPT_YOURS --agent {agent}
+│   niwa resolve {node_id} ACCEPT_THEIRS --agent {agent}
+│   niwa resolve {node_id} MANUAL_MERGE "<content>" --agent {agent}
+└──────────────────────────────────────────────────────────────────────────────┘""".format
+
+
+@_command('conflicts', agent=True)
+def _cmd_conflicts(args, db):
+    """List unresolved conflicts for the agent."""
+    conflicts = db.get_pending_conflicts(args.agent)
+    if args.json:
+        _print_json(conflicts)
+        return
+
+    out = []
+    if not conflicts:
+        out.append("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ NO PENDING CONFLICTS                                                      ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            else:
-                print(f"""
+    else:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ⚠️  PENDING CONFLICTS: {len(conflicts):<53} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                for c in conflicts:
-                    ts = datetime.fromtimestamp(c.get('stored_at', 0)).strftime('%Y-%m-%d %H:%M')
-                    auto = "✓ auto-merge" if c.get('auto_merge_possible') else "✗ manual"
-                    print(f"""
-┌──────────────────────────────────────────────────────────────────────────────┐
-│ Node: [{c['node_id']}] "{c.get('node_title', '?')[:50]}"
-│ Agent: {c['agent_id']}
-│ Stored: {ts}
-│ Version conflict: v{c.get('your_base_version')} → v{c.get('current_version')} ({auto})
-│
-│ Resolve with:
-│   niwa resolve {c['node_id']} ACCEPT_YOURS --agent {c['agent_id']}
-│   niwa resolve {c['node_id']} ACCEPT_THEIRS --agent {c['agent_id']}
-│   niwa resolve {c['node_id']} MANUAL_MERGE "<content>" --agent {c['agent_id']}
-└──────────────────────────────────────────────────────────────────────────────┘""")
-
-        elif args.command == 'check':
-            health = db.get_db_health()
-            status_icon = "✅" if health['initialized'] else "❌"
-            print(f"""
+        for c in conflicts:
+            ts = _ts(c.get('stored_at', 0), _TS_MINUTE)
+            auto = "✓ auto-merge" if c.get('auto_merge_possible') else "✗ manual"
+            out.append(_CONFLICT_CARD(
+                node_id=c['node_id'],
+                title=c.get('node_title', '?'),
+                agent=c['agent_id'],
+                stored=ts,
+                base=c.get('your_base_version'),
+                current=c.get('current_version'),
+                auto=auto,
+            ))
+    _emit(out)
+
+
+# Bound once at import; `niwa check` is what orchestrators poll
+_CHECK_REPORT = """
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 🏥 DATABASE HEALTH CHECK                                                     ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Status: {status_icon} {'INITIALIZED' if health['initialized'] else 'NOT INITIALIZED':<66} ║
-║ Path: {str(health['db_path'])[:70]:<70} ║
+║ Status: {0} {1:<66} ║
+║ Path: {2:<70.70} ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Nodes: {health['node_count']:<69} ║
-║ Has root: {'Yes' if health['has_root'] else 'No':<66} ║
-║ Total versions: {health['total_versions']:<60} ║
-║ Pending edits: {health['pending_edit_count']:<61} ║
-║ Pending conflicts: {health['pending_conflict_count']:<57} ║
+║ Nodes: {3:<69} ║
+║ Has root: {4:<66} ║
+║ Total versions: {5:<60} ║
+║ Pending edits: {6:<61} ║
+║ Pending conflicts: {7:<57} ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Active agents: {', '.join(health['active_agents'][:5]) if health['active_agents'] else '(none)':<61} ║
+║ Active agents: {8:<61} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-            if not health['initialized']:
-                print("""
+""".format
+
+
+@_command('check')
+def _cmd_check(args, db):
+    """Verify database health."""
+    health = db.get_db_health()
+    if args.json:
+        _print_json(health)
+        return
+    initialized = health['initialized']
+    print(_CHECK_REPORT(
+        "✅" if initialized else "❌",
+        'INITIALIZED' if initialized else 'NOT INITIALIZED',
+        str(health['db_path']),
+        health['node_count'],
+        'Yes' if health['has_root'] else 'No',
+        health['total_versions'],
+        health['pending_edit_count'],
+        health['pending_conflict_count'],
+        ', '.join(health['active_agents'][:5]) if health['active_agents'] else '(none)',
+    ))
+    if not health['initialized']:
+        print("""
 ⚠️  DATABASE NOT INITIALIZED!
 
 Run these commands to set up:
@@ -989,46 +911,54 @@ Run these commands to set up:
   niwa add "Section Title" --agent <name>
 """)
 
-        elif args.command == 'agents':
-            agents = db.list_all_agents()
-            if not agents:
-                print("""
+
+_AGENT_CARD = """
+┌──────────────────────────────────────────────────────────────────────────────┐
+│ Agent: {0:<68} │
+│ Edits: {1:<68} │
+│ First seen: {2:<63} │
+│ Last seen: {3:<64} │
+│ Nodes: {4:<68} │
+└──────────────────────────────────────────────────────────────────────────────┘""".format
+
+
+@_command('agents')
+def _cmd_agents(args, db):
+    """List all agents who've used this database."""
+    agents = db.list_all_agents()
+    if args.json:
+        _print_json(agents)
+        return
+    out = []
+    if not agents:
+        out.append("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ No agents have used this database yet.                                       ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            else:
-                print(f"""
+    else:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 👥 REGISTERED AGENTS: {len(agents):<54} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                for a in agents:
-                    first = datetime.fromtimestamp(a['first_seen']).strftime('%m-%d %H:%M') if a['first_seen'] else '?'
-                    last = datetime.fromtimestamp(a['last_seen']).strftime('%m-%d %H:%M') if a['last_seen'] else '?'
-                    nodes = ', '.join(a['nodes_edited'][:3])
-                    if len(a['nodes_edited']) > 3:
-                        nodes += f" +{len(a['nodes_edited'])-3} more"
-                    print(f"""
-┌──────────────────────────────────────────────────────────────────────────────┐
-│ Agent: {a['agent_id']:<68} │
-│ Edits: {a['edit_count']:<68} │
-│ First seen: {first:<63} │
-│ Last seen: {last:<64} │
-│ Nodes: {nodes:<68} │
-└──────────────────────────────────────────────────────────────────────────────┘""")
-
-                # Suggest a new unique name
-                suggested = db.suggest_agent_name()
-                print(f"""
+        for a in agents:
+            first = _ts(a['first_seen'], _TS_SHORT) if a['first_seen'] else '?'
+            last = _ts(a['last_seen'], _TS_SHORT) if a['last_seen'] else '?'
+            edited = a['nodes_edited']
+            extra = len(edited) - 3
+            nodes = ', '.join(islice(edited, 3)) + (f" +{extra} more" if extra > 0 else "")
+            out.append(_AGENT_CARD(a['agent_id'], a['edit_count'], first, last, nodes))
+
+        # Suggest a new unique name
+        suggested = db.suggest_agent_name()
+        out.append(f"""
 💡 Need a unique agent name? Try: --agent {suggested}
 """)
+    _emit(out)
 
-        elif args.command == 'whoami':
-            if args.agent == "default_agent":
-                # No agent specified - suggest one
-                suggested = db.suggest_agent_name()
-                print(f"""
+
+_WHOAMI_SUGGESTION = """
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 🤖 AGENT NAME SUGGESTION                                                     ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1045,52 +975,91 @@ Run these commands to set up:
    - Use a UNIQUE name to avoid conflicts with other agents
    - Use the SAME name consistently for all your reads/edits
    - Check existing agents with: niwa agents
-""")
-            else:
-                # Agent specified - show their state
-                status = db.get_agent_status(args.agent)
-                pending_reads = len(status['pending_reads'])
-                stale_reads = sum(1 for pr in status['pending_reads'] if pr['stale'])
-                pending_conflicts = len(status['pending_conflicts'])
+""".format
 
-                state_icon = "✅" if pending_conflicts == 0 and stale_reads == 0 else "⚠️"
-                print(f"""
+_WHOAMI_AGENT = """
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ 🤖 AGENT: {args.agent:<66} ║
+║ 🤖 AGENT: {0:<66} ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Status: {state_icon} {'CLEAR' if pending_conflicts == 0 and stale_reads == 0 else 'NEEDS ATTENTION':<67} ║
-║ Pending reads: {pending_reads:<61} ║
-║ Stale reads: {stale_reads:<63} ║
-║ Pending conflicts: {pending_conflicts:<57} ║
-║ Nodes touched: {len(status['nodes_touched']):<61} ║
+║ Status: {1} {2:<67} ║
+║ Pending reads: {3:<61} ║
+║ Stale reads: {4:<63} ║
+║ Pending conflicts: {5:<57} ║
+║ Nodes touched: {6:<61} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
-""")
-                if pending_conflicts > 0:
-                    print(f"⚠️  You have {pending_conflicts} conflict(s) to resolve!")
-                    print(f"    Run: niwa conflicts --agent {args.agent}")
-                if stale_reads > 0:
-                    print(f"⚠️  You have {stale_reads} stale read(s) - re-read before editing!")
-                    print(f"    Run: niwa status --agent {args.agent}")
-                if pending_conflicts == 0 and stale_reads == 0:
-                    print("✅ Ready to work! No pending issues.")
-
-        # =====================================================================
-        # SEARCH, HISTORY, ROLLBACK, DRY-RUN, CLEANUP
-        # =====================================================================
-
-        elif args.command == 'search':
-            if not args.args:
-                print_command_help('search')
-                return
-            query = args.args[0]
-            results = db.search_content(query, case_sensitive=args.case_sensitive)
+""".format
 
-            if not results:
-                print(f"""
+
+@_command('whoami', agent=True)
+def _cmd_whoami(args, db):
+    """Suggest an agent name, or show the given agent's state."""
+    if args.agent is None:
+        # No agent specified - suggest one
+        suggested = db.suggest_agent_name()
+        if args.json:
+            _print_json({'agent': None, 'suggested_name': suggested})
+            return
+        print(_WHOAMI_SUGGESTION(suggested=suggested))
+    else:
+        # Agent specified - show their state
+        status = db.get_agent_status(args.agent)
+        pending_reads = len(status['pending_reads'])
+        stale_reads = sum(1 for pr in status['pending_reads'] if pr['stale'])
+        pending_conflicts = len(status['pending_conflicts'])
+        if args.json:
+            _print_json({
+                'agent': args.agent,
+                'pending_reads': pending_reads,
+                'stale_reads': stale_reads,
+                'pending_conflicts': pending_conflicts,
+                'nodes_touched': len(status['nodes_touched']),
+            })
+            return
+
+        state_icon = "✅" if pending_conflicts == 0 and stale_reads == 0 else "⚠️"
+        print(_WHOAMI_AGENT(
+            args.agent,
+            state_icon,
+            'CLEAR' if pending_conflicts == 0 and stale_reads == 0 else 'NEEDS ATTENTION',
+            pending_reads,
+            stale_reads,
+            pending_conflicts,
+            len(status['nodes_touched']),
+        ))
+        if pending_conflicts > 0:
+            print(f"⚠️  You have {pending_conflicts} conflict(s) to resolve!")
+            print(f"    Run: niwa conflicts --agent {args.agent}")
+        if stale_reads > 0:
+            print(f"⚠️  You have {stale_reads} stale read(s) - re-read before editing!")
+            print(f"    Run: niwa status --agent {args.agent}")
+        if pending_conflicts == 0 and stale_reads == 0:
+            print("✅ Ready to work! No pending issues.")
+
+
+# =====================================================================
+# SEARCH, HISTORY, ROLLBACK, DRY-RUN, CLEANUP
+# =====================================================================
+
+@_command('search', required=(None,))
+def _cmd_search(args, db):
+    """Search content by keyword."""
+    query = args.args[0]
+    if args.json:
+        _print_json(db.search_content(query, case_sensitive=args.case_sensitive, max_lines_per_node=3))
+        return
+
+    # Only the first 10 results are rendered; the rest are just counted
+    results, found = db.search_content_page(
+        query, case_sensitive=args.case_sensitive, max_lines_per_node=3, limit=10,
+    )
+
+    out = []
+    if not results:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 🔍 NO RESULTS FOUND                                                          ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Query: "{query[:60]:<60}" ║
+║ Query: "{_fit(query, 60)}" ║
 ║ Case-sensitive: {'Yes' if args.case_sensitive else 'No':<59} ║
 ║                                                                              ║
 ║ Try:                                                                         ║
@@ -1099,38 +1068,52 @@ Run these commands to set up:
 ║   - Partial words                                                            ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            else:
-                print(f"""
+    else:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
-║ 🔍 SEARCH RESULTS: {len(results)} node(s) found                                        ║
+║ 🔍 SEARCH RESULTS: {found} node(s) found                                        ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║ Query: "{query[:60]:<60}" ║
+║ Query: "{_fit(query, 60)}" ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                for r in results[:10]:  # Limit to 10 results
-                    title_match = " (title match)" if r['match_in_title'] else ""
-                    print(f"""
+        for r in results:
+            title_match = " (title match)" if r['match_in_title'] else ""
+            out.append(f"""
 ┌──────────────────────────────────────────────────────────────────────────────┐
-│ [{r['node_id']}] v{r['version']} "{r['title'][:50]}"{title_match}
+│ [{r['node_id']}] v{r['version']} "{r['title']:.50}"{title_match}
 │ Matches: {r['total_matches']} line(s)""")
-                    for line_num, line_text in r['matching_lines'][:3]:
-                        print(f"│   Line {line_num}: {line_text[:65]}...")
-                    print("│")
-                    print(f"│ → Read: niwa read {r['node_id']} --agent <your_name>")
-                    print("└──────────────────────────────────────────────────────────────────────────────┘")
-
-                if len(results) > 10:
-                    print(f"\n... and {len(results) - 10} more results")
-
-        elif args.command == 'history':
-            if not args.args:
-                print_command_help('history')
-                return
-            node_id = args.args[0]
-            history = db.get_node_history(node_id)
+            out.extend(f"│   Line {line_num}: {line_text:.65}..." for line_num, line_text in r['matching_lines'])
+            out.append("│")
+            out.append(f"│ → Read: niwa read {r['node_id']} --agent <your_name>")
+            out.append("└──────────────────────────────────────────────────────────────────────────────┘")
 
-            if not history:
-                print(f"""
+        if found > len(results):
+            out.append(f"\n... and {found - len(results)} more results")
+    _emit(out)
+
+
+_HISTORY_CARD = """
+┌──────────────────────────────────────────────────────────────────────────────┐
+│ Version {0} - {1}
+│ Agent: {2}
+│ Summary: {3:.60}
+│ Status: {4}
+│ Preview: {5:.60}
+└──────────────────────────────────────────────────────────────────────────────┘""".format
+
+
+@_command('history', required=(None,))
+def _cmd_history(args, db):
+    """Show version history of a node."""
+    node_id = args.args[0]
+    history = db.get_node_history(node_id)
+    if args.json:
+        _print_json(history)
+        return
+
+    out = []
+    if not history:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ NO HISTORY FOUND                                                          ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1139,44 +1122,42 @@ Run these commands to set up:
 ║ Check available nodes: niwa tree                             ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-            else:
-                print(f"""
+    else:
+        out.append(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 📜 VERSION HISTORY: [{node_id}]                                              ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                for h in history:
-                    ts = datetime.fromtimestamp(h['timestamp']).strftime('%Y-%m-%d %H:%M:%S') if h.get('timestamp') else '?'
-                    has_content = "✓ can rollback" if h.get('has_content') else "✗ no content stored"
-                    preview = h.get('content_preview', '')[:60].replace('\n', ' ') + '...' if h.get('content_preview') else ''
-                    print(f"""
-┌──────────────────────────────────────────────────────────────────────────────┐
-│ Version {h['version']} - {ts}
-│ Agent: {h.get('agent', '?')}
-│ Summary: {(h.get('summary') or '(none)')[:60]}
-│ Status: {has_content}
-│ Preview: {preview[:60]}
-└──────────────────────────────────────────────────────────────────────────────┘""")
-
-                print(f"""
+        for h in history:
+            ts = _ts(h['timestamp']) if h.get('timestamp') else '?'
+            has_content = "✓ can rollback" if h.get('has_content') else "✗ no content stored"
+            preview = h.get('content_preview', '')[:60].replace('\n', ' ') + '...' if h.get('content_preview') else ''
+            out.append(_HISTORY_CARD(
+                h['version'], ts, h.get('agent', '?'),
+                h.get('summary') or '(none)', has_content, preview,
+            ))
+
+        out.append(f"""
 💡 To rollback: niwa rollback {node_id} <version> --agent <you>
 """)
+    _emit(out)
 
-        elif args.command == 'rollback':
-            if len(args.args) < 2:
-                print_command_help('rollback')
-                return
-            node_id = args.args[0]
-            try:
-                version = int(args.args[1])
-            except ValueError:
-                print(f"❌ Version must be a number, got: {args.args[1]}")
-                return
 
-            # Get the old content
-            old_content = db.get_version_content(node_id, version)
-            if not old_content:
-                print(f"""
+@_command('rollback', required=(None, None), agent=True)
+def _cmd_rollback(args, db):
+    """Restore a node to a previous version."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    try:
+        version = int(args.args[1])
+    except ValueError:
+        print(f"❌ Version must be a number, got: {args.args[1]}")
+        return
+
+    # Get the old content
+    old_content = db.get_version_content(node_id, version)
+    if not old_content:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ CANNOT ROLLBACK                                                           ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1189,59 +1170,51 @@ Run these commands to set up:
 ║ Check available versions: niwa history {node_id}             ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                return
+        return
 
-            # Apply the rollback via internal force edit (bypasses conflict detection)
-            result = db._force_edit(
-                node_id, old_content, args.agent,
-                f"Rollback to v{version}",
-            )
+    # Apply the rollback via internal force edit (bypasses conflict detection)
+    result = db._force_edit(
+        node_id, old_content, agent,
+        f"Rollback to v{version}",
+    )
 
-            if result.success:
-                print(f"""
+    if result.success:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ ROLLBACK SUCCESSFUL                                                       ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Node: {node_id:<70} ║
 ║ Rolled back to version {version} content                                      ║
 ║ New version: {result.new_version:<63} ║
-║ Agent: {args.agent:<69} ║
+║ Agent: {agent:<69} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 💡 Note: This created a NEW version with the old content. History is preserved.
    To undo this rollback, run rollback again with the previous version number.
 """)
-            else:
-                print(f"❌ Rollback failed: {result.message}")
+    else:
+        print(f"❌ Rollback failed: {result.message}")
 
-        elif args.command == 'dry-run':
-            if not args.args:
-                print_command_help('dry-run')
-                return
 
-            node_id = args.args[0]
-
-            # Get content from file, stdin, or args
-            content = None
-            if args.file:
-                try:
-                    with open(args.file, 'r') as f:
-                        content = f.read()
-                except Exception as e:
-                    print(f"❌ Cannot read file: {e}")
-                    return
-            elif args.stdin:
-                content = sys.stdin.read()
-            elif len(args.args) >= 2:
-                content = args.args[1]
-            else:
-                print("❌ No content provided. Use inline, --file, or --stdin")
-                return
+@_command('dry-run', required=(None,), agent=True)
+def _cmd_dry_run(args, db):
+    """Preview an edit without applying it."""
+    agent = args.agent_id
+    node_id = args.args[0]
 
-            result = db.dry_run_edit(node_id, content, args.agent)
+    # Get content from file, stdin, or args
+    content, error = _read_content(args, 1)
+    if error is not None:
+        print(f"❌ Cannot read file: {error}")
+        return
+    if content is None:
+        print("❌ No content provided. Use inline, --file, or --stdin")
+        return
 
-            if result['would_succeed']:
-                print(f"""
+    result = db.dry_run_edit(node_id, content, agent)
+
+    if result['would_succeed']:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ DRY RUN: EDIT WOULD SUCCEED                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1251,11 +1224,11 @@ Run these commands to set up:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 To actually apply this edit:
-  niwa edit {node_id} {"--file " + args.file if args.file else '"<content>"'} --agent {args.agent}
+  niwa edit {node_id} {"--file " + args.file if args.file else '"<content>"'} --agent {agent}
 """)
-            else:
-                icon = "⚠️" if result['reason'] == 'conflict' else "❌"
-                print(f"""
+    else:
+        icon = "⚠️" if result['reason'] == 'conflict' else "❌"
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ {icon} DRY RUN: EDIT WOULD FAIL                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1264,33 +1237,33 @@ To actually apply this edit:
 ║ {result['message']:<76} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                if result['reason'] == 'conflict':
-                    print(f"""
+        if result['reason'] == 'conflict':
+            print(f"""
 You're {result.get('versions_behind', '?')} version(s) behind.
 
 Re-read to get the latest version, then edit:
-  niwa read {node_id} --agent {args.agent}
+  niwa read {node_id} --agent {agent}
 """)
 
-        elif args.command == 'delete':
-            if not args.args:
-                print_error('no_node_id')
-                print_command_help('delete')
-                return
-            node_id = args.args[0]
-            result = db.delete_node(node_id, args.agent)
-            if result.success:
-                print(f"""
+
+@_command('delete', required=('no_node_id',), agent=True)
+def _cmd_delete(args, db):
+    """Delete a node, reparenting its children."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    result = db.delete_node(node_id, agent)
+    if result.success:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ NODE DELETED                                                              ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ {result.message:<76} ║
-║ Agent: {args.agent:<69} ║
+║ Agent: {agent:<69} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                print(db.get_tree())
-            else:
-                print(f"""
+        print(db.get_tree())
+    else:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ DELETE FAILED                                                             ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1298,18 +1271,18 @@ Re-read to get the latest version, then edit:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'move':
-            if not args.args:
-                print_error('no_node_id')
-                print_command_help('move')
-                return
-            node_id = args.args[0]
-            new_parent_id = args.under
-            if not new_parent_id:
-                if len(args.args) >= 2:
-                    new_parent_id = args.args[1]
-                else:
-                    print(f"""
+
+@_command('move', required=('no_node_id',), agent=True)
+def _cmd_move(args, db):
+    """Move a node under a different parent."""
+    agent = args.agent_id
+    node_id = args.args[0]
+    new_parent_id = args.under
+    if not new_parent_id:
+        if len(args.args) >= 2:
+            new_parent_id = args.args[1]
+        else:
+            print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ MISSING TARGET PARENT                                                     ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1321,21 +1294,21 @@ Re-read to get the latest version, then edit:
 ║   niwa move h2_3 --under root --agent claude_1              ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                    return
+            return
 
-            result = db.move_node(node_id, new_parent_id, args.agent)
-            if result.success:
-                print(f"""
+    result = db.move_node(node_id, new_parent_id, agent)
+    if result.success:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ✅ NODE MOVED                                                                ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ {result.message:<76} ║
-║ Agent: {args.agent:<69} ║
+║ Agent: {agent:<69} ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
-                print(db.get_tree())
-            else:
-                print(f"""
+        print(db.get_tree())
+    else:
+        print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ ❌ MOVE FAILED                                                               ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
@@ -1343,24 +1316,330 @@ Re-read to get the latest version, then edit:
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
-        elif args.command == 'cleanup':
-            reads_cleaned = db.cleanup_stale_reads(args.max_age)
-            conflicts_cleaned = db.cleanup_stale_conflicts(args.max_age * 24)  # 24x longer for conflicts
 
-            print(f"""
+@_command('cleanup')
+def _cmd_cleanup(args, db):
+    """Remove stale pending reads and conflicts."""
+    read_age = args.max_age
+    conflict_age = read_age * 24  # 24x longer for conflicts
+    reads_cleaned, conflicts_cleaned = db.cleanup_stale(read_age, conflict_age)
+
+    print(f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║ 🧹 CLEANUP COMPLETE                                                          ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
 ║ Stale pending reads removed: {reads_cleaned:<46} ║
 ║ Stale conflicts removed: {conflicts_cleaned:<51} ║
-║ Max age for reads: {args.max_age} seconds ({args.max_age // 60} minutes)                           ║
-║ Max age for conflicts: {args.max_age * 24} seconds ({args.max_age * 24 // 3600} hours)                        ║
+║ Max age for reads: {read_age} seconds ({read_age // 60} minutes)                           ║
+║ Max age for conflicts: {conflict_age} seconds ({conflict_age // 3600} hours)                        ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """)
 
+
+def _fast_path(argv) -> bool:
+    """Handle help, --version and hook invocations without argparse.
+
+    Returns True if ``argv`` was handled. Anything with extra flags falls
+    through to the full parser.
+    """
+    if not argv or argv == ['help']:
+        from .core import LLM_SYSTEM_PROMPT
+        print(LLM_SYSTEM_PROMPT)
+        return True
+    if len(argv) == 2 and argv[0] == 'help' and not argv[1].startswith('-'):
+        _print_command_help(argv[1])
+        return True
+    if argv == ['-v'] or argv == ['--version']:
+        print(f'niwa {__version__}')
+        return True
+    if argv[0] == 'hook':
+        event = None
+        if len(argv) == 3 and argv[1] == '--hook-event':
+            event = argv[2]
+        elif len(argv) == 2 and argv[1].startswith('--hook-event='):
+            event = argv[1].split('=', 1)[1]
+        if event:
+            from .core import handle_hook_event
+            sys.exit(handle_hook_event(event))
+    return False
+
+
+COMMANDS_HELP = """
+commands:
+  init                  Initialize a new database
+  load <file>           Load markdown file into database
+  add <title> [content] Add a node directly (--parent, --file, --stdin)
+  tree                  Show document structure with node IDs
+  read <id>             Read for editing (--all, --section N, --lines M-N)
+  edit <id> <content>   Edit a node's content
+  resolve <id> <type>   Resolve a conflict (ACCEPT_YOURS|ACCEPT_THEIRS|MANUAL_MERGE)
+  search <query>        Search content by keyword
+  history <id>          View version history of a node
+  rollback <id> <ver>   Restore node to previous version
+  export                Export database back to markdown
+  status                Check agent's pending reads/conflicts
+  conflicts             List unresolved conflicts for agent
+  agents                List all agents who've used this database
+  whoami                Get suggested unique agent name
+  check                 Verify database health
+  cleanup               Remove stale pending reads/conflicts
+  delete <id>           Delete a node (children reparented to parent)
+  move <id>             Move a node under a different parent (--under)
+  setup <target>        Set up integrations (e.g., 'setup claude')
+  help [command]        Show help (optionally for specific command)
+
+examples:
+  niwa init                              # Initialize database
+  niwa add "Requirements" --agent claude  # Add a node directly
+  niwa tree                              # See structure
+  niwa read h2_3 --agent claude_1        # Read node for editing
+  niwa edit h2_3 "new content" --agent claude_1  # Edit node
+  niwa export > output.md                # Export to markdown
+"""
+
+
+_DB_NOT_INITIALIZED = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ DATABASE NOT INITIALIZED                                                  ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ The database doesn't exist yet. You need to initialize it first.             ║
+║                                                                              ║
+║ STEP 1: Initialize                                                           ║
+║   niwa init                                                  ║
+║                                                                              ║
+║ STEP 2: Add nodes to build the tree                                          ║
+║   niwa add "Section Title" --agent <name>                    ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+_PARSER = None
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    """Build the argument parser once per process."""
+    global _PARSER
+    if _PARSER is not None:
+        return _PARSER
+
+    parser = argparse.ArgumentParser(
+        description="Niwa 庭 - Collaborative Markdown Database for LLM Agents",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=COMMANDS_HELP
+    )
+    parser.add_argument('-v', '--version', action='version', version=f'niwa {__version__}')
+    parser.add_argument('command', nargs='?', default='help', metavar='COMMAND',
+                       help='Command to run (see commands below)')
+    parser.add_argument('args', nargs='*', help='Command arguments')
+    parser.add_argument('--agent', default=None, help='Agent ID (use a unique name!)')
+    parser.add_argument('--summary', default=None, help='Edit summary (helps with conflict resolution)')
+    parser.add_argument('--file', default=None, help='Read content from file instead of command line (avoids escaping issues)')
+    parser.add_argument('--stdin', action='store_true', help='Read content from stdin (for piping)')
+    parser.add_argument('--case-sensitive', action='store_true', help='Case-sensitive search')
+    parser.add_argument('--max-age', type=int, default=3600, help='Max age in seconds for cleanup (default 3600)')
+    parser.add_argument('--dry-run', action='store_true', help='Preview edit without applying')
+    parser.add_argument('--parent', default=None, help='Parent node ID for add command (default: root)')
+    parser.add_argument('--all', action='store_true', dest='show_all', help='Show full content even for large nodes')
+    parser.add_argument('--section', type=int, default=None, help='Show specific section number from content structure')
+    parser.add_argument('--lines', default=None, help='Show specific line range (e.g., "1-25")')
+    parser.add_argument('--remove', action='store_true', help='Remove hook configuration (for setup --remove)')
+    parser.add_argument('--global', action='store_true', dest='global_hooks', help='Install hooks globally (~/.claude/settings.json)')
+    parser.add_argument('--under', default=None, help='Target parent node ID for move command')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of boxes (status, conflicts, agents, check, whoami, search, history)')
+    parser.add_argument('--quiet', action='store_true', help='Skip the full usage guide on errors and the path after add (for scripted callers)')
+    # Hook event handling (called by Claude Code hooks)
+    parser.add_argument('--hook-event', default=None, help='Hook event name (internal use by hooks)')
+    parser.add_argument('--hook-input', default=None, help='Path to hook input JSON file (internal use)')
+
+    _PARSER = parser
+    return parser
+
+
+# Banners for `niwa setup`
+_SETUP_MISSING_TARGET = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ ERROR: Missing integration target                                         ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ USAGE:                                                                       ║
+║   niwa setup claude     # Set up Claude Code hooks           ║
+║   niwa setup --remove   # Remove hooks (after target)        ║
+║                                                                              ║
+║ SUPPORTED TARGETS:                                                           ║
+║   claude - Claude Code (creates .claude/settings.json)                       ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+_SETUP_REMOVED = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ✅ CLAUDE CODE HOOKS REMOVED                                                 ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ {message:<76} ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+_SETUP_INSTALLED = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ✅ CLAUDE CODE HOOKS INSTALLED                                               ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ {message:<76} ║
+║                                                                              ║
+║ HOOKS INSTALLED:                                                             ║
+║   • SessionStart - Injects Niwa usage guide + status on session start        ║
+║   • PreCompact   - Preserves Niwa context before context compaction          ║
+║   • PreToolUse   - Warns about conflicts before Write/Edit                   ║
+║   • PostToolUse  - Hints to sync after markdown file changes                 ║
+║   • Stop         - Reminds about unresolved conflicts                        ║
+║                                                                              ║
+║ Claude will remember how to use Niwa even after /compact.                    ║
+║                                                                              ║
+║ TO REMOVE LATER:                                                             ║
+║   niwa setup claude --remove                                                ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+_SETUP_FAILED = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ SETUP FAILED                                                              ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ {message:<76} ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+_SETUP_UNKNOWN_TARGET = """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ UNKNOWN TARGET: {target:<56} ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ SUPPORTED TARGETS:                                                           ║
+║   claude - Claude Code (creates .claude/settings.json)                       ║
+║                                                                              ║
+║ EXAMPLE:                                                                     ║
+║   niwa setup claude                                          ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+
+def _cmd_help(args):
+    """Show the full guide, or help for one command."""
+    if args.args:
+        _print_command_help(args.args[0])
+    else:
+        from .core import LLM_SYSTEM_PROMPT
+        print(LLM_SYSTEM_PROMPT)
+
+
+def _cmd_setup(args):
+    """Install or remove editor hooks (doesn't require database)."""
+    if not args.args:
+        _print_command_help('setup')
+        print(_SETUP_MISSING_TARGET)
+        return
+
+    target = args.args[0].lower()
+
+    if target == 'claude':
+        if args.global_hooks:
+            project_dir = str(Path.home())
         else:
-            print_error('unknown_command')
-            print(f"\nYou entered: '{args.command}'")
+            project_dir = os.getcwd()
+        from .core import setup_claude_hooks
+        success, message = setup_claude_hooks(project_dir, remove=args.remove)
+
+        if success:
+            if args.remove:
+                print(_SETUP_REMOVED.format(message=message))
+            else:
+                print(_SETUP_INSTALLED.format(message=message))
+        else:
+            print(_SETUP_FAILED.format(message=message))
+    else:
+        print(_SETUP_UNKNOWN_TARGET.format(target=target))
+
+
+def _cmd_hook(args):
+    """Handle a Claude Code hook event (internal use)."""
+    if not args.hook_event:
+        print("Hook event not specified. Use --hook-event <event_name>", file=sys.stderr)
+        sys.exit(1)
+
+    # Handle the hook event
+    from .core import handle_hook_event
+    exit_code = handle_hook_event(args.hook_event)
+    sys.exit(exit_code)
+
+
+# Commands that run before (and without) the database
+_NO_DB_COMMANDS = {
+    'help': _cmd_help,
+    'setup': _cmd_setup,
+    'hook': _cmd_hook,
+}
+
+
+def main():
+    if _fast_path(sys.argv[1:]):
+        return
+    args = _get_parser().parse_args()
+
+    handler = _NO_DB_COMMANDS.get(args.command)
+    if handler is not None:
+        handler(args)
+        return
+
+    entry = _COMMANDS.get(args.command)
+    if entry is None:
+        _print_error(args, 'unknown_command')
+        print(f"\nYou entered: '{args.command}'")
+        return
+
+    # Check for database existence for commands that need it
+    if args.command != 'init' and not db_exists():
+        _print_guide(args, "❌ DATABASE NOT INITIALIZED - YOU MUST INITIALIZE FIRST")
+        print(_DB_NOT_INITIALIZED)
+        return
 
+    # `--agent default_agent` means the same as leaving the flag out
+    if args.agent == DEFAULT_AGENT:
+        args.agent = None
+
+    # Usage errors don't need the database
+    handler, required, checks_agent = entry
+    if len(args.args) < len(required):
+        error_type = required[len(args.args)]
+        if error_type:
+            _print_error(args, error_type)
+        _print_command_help(args.command)
+        return
+
+    # Validate agent name for commands that use it
+    if checks_agent and args.agent is not None:
+        from .agents import validate_agent_name
+        valid, msg = validate_agent_name(args.agent)
+        if not valid:
+            print(f"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ INVALID AGENT NAME                                                        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ {msg:<76} ║
+║                                                                              ║
+║ Agent names must:                                                            ║
+║   - Contain only letters, numbers, underscore (_), hyphen (-)                ║
+║   - Be 1-50 characters long                                                  ║
+║   - Not be "default_agent"                                                   ║
+║                                                                              ║
+║ GOOD EXAMPLES: claude_1, researcher_A, agent-42                              ║
+║ BAD EXAMPLES: "my agent", agent@1, agent/sub                                 ║
+║                                                                              ║
+║ Get a suggested name: niwa whoami                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+""")
+            return
+
+    # Agent ID handlers record; args.agent stays None when --agent was
+    # omitted so whoami and conflicts can tell the difference
+    args.agent_id = args.agent or DEFAULT_AGENT
+
+    from .niwa import Niwa
+    db = Niwa()
+    try:
+        handler(args, db)
     finally:
         db.close()
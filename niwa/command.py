@@ -1,11 +1,21 @@
 """niwa.command - Auto-split module"""
 
+import sys
+from types import MappingProxyType
 
-COMMAND_HELP = {
-    'init': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: init                                                                ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+_TOP = "╔" + "═" * 78 + "╗"
+_MID = "╠" + "═" * 78 + "╣"
+_BOTTOM = "╚" + "═" * 78 + "╝"
+
+
+def _box(command: str, body: str) -> str:
+    """Frame a command's help rows (already padded ║ ... ║ lines)."""
+    return f"\n{_TOP}\n║ COMMAND: {command:<67} ║\n{_MID}\n{body}{_BOTTOM}\n"
+
+
+# Read-only: the help text is static and shared by every caller
+COMMAND_HELP = MappingProxyType({
+    'init': _box('init', """\
 ║ PURPOSE: Initialize a new markdown database                                  ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -18,12 +28,8 @@ COMMAND_HELP = {
 ║                                                                              ║
 ║ NEXT STEP:                                                                   ║
 ║   niwa add "Section Title" --agent <name>                    ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'load': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: load                                                                ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'load': _box('load', """\
 ║ ⚠️ DO NOT USE unless the user explicitly asks you to load a file!             ║
 ║ Use `niwa add` to build the tree incrementally instead.                     ║
 ║                                                                              ║
@@ -44,12 +50,8 @@ COMMAND_HELP = {
 ║ NEXT STEP:                                                                   ║
 ║   niwa tree    # See the structure                           ║
 ║   niwa read <node_id> --agent <name>   # Read a section      ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'add': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: add                                                                 ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'add': _box('add', """\
 ║ PURPOSE: Add a new node directly without loading a markdown file            ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -77,12 +79,8 @@ COMMAND_HELP = {
 ║   - Node ID is auto-generated (e.g. h1_a3f2)                               ║
 ║   - Level is inferred from parent (parent level + 1)                        ║
 ║   - Node type is always 'heading'                                           ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'tree': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: tree                                                                ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'tree': _box('tree', """\
 ║ PURPOSE: Display document structure with node IDs, token counts, and AST     ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -107,12 +105,8 @@ COMMAND_HELP = {
 ║       | 3¶ · 1 code(python) · 1 table                                       ║
 ║       [h3_2] v1 "Section 1.1" (by system) ~80 tok                            ║
 ║         | 1¶ · 1 code(bash)                                                  ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'read': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: read                                                                ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'read': _box('read', """\
 ║ PURPOSE: Read a node FOR EDITING (tracks your read version)                  ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -152,12 +146,8 @@ COMMAND_HELP = {
 ║                                                                              ║
 ║ NEXT STEP:                                                                   ║
 ║   niwa edit h2_3 "<new content>" --agent claude_researcher   ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'edit': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: edit                                                                ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'edit': _box('edit', """\
 ║ PURPOSE: Edit a node's content (with conflict detection)                     ║
 ║                                                                              ║
 ║ USAGE (3 ways to provide content):                                           ║
@@ -199,12 +189,8 @@ COMMAND_HELP = {
 ║   CONFLICT: Shows detailed diff and resolution options                       ║
 ║                                                                              ║
 ║ 💡 TIP: Use --file for content with quotes, newlines, or special chars!      ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'resolve': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: resolve                                                             ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'resolve': _box('resolve', """\
 ║ PURPOSE: Resolve a conflict after an edit attempt failed                     ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -233,12 +219,8 @@ COMMAND_HELP = {
 ║   niwa resolve h2_3 MANUAL_MERGE --file /tmp/m.md --agent me ║
 ║                                                                              ║
 ║ 💡 TIP: Use --file for merged content with quotes, newlines, special chars!  ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'export': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: export                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'export': _box('export', """\
 ║ PURPOSE: Export the database back to markdown format                         ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -252,12 +234,8 @@ COMMAND_HELP = {
 ║   - Traverses the document tree                                              ║
 ║   - Reconstructs markdown with headings and content                          ║
 ║   - Preserves all edits made through the database                            ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'title': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: title                                                               ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'title': _box('title', """\
 ║ PURPOSE: Update a node's title (heading text)                                ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -267,12 +245,8 @@ COMMAND_HELP = {
 ║   niwa title h2_3 "Updated Section Name" --agent claude_1    ║
 ║                                                                              ║
 ║ NOTE: Title updates don't use conflict detection (titles are simple)         ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'summarize': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: summarize                                                           ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'summarize': _box('summarize', """\
 ║ PURPOSE: Add a summary/description to a node                                 ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -282,12 +256,8 @@ COMMAND_HELP = {
 ║   niwa summarize h2_3 "Covers API integration" --agent me    ║
 ║                                                                              ║
 ║ NOTE: Summaries help other agents understand sections without reading fully  ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'status': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: status                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'status': _box('status', """\
 ║ PURPOSE: Check your agent's current state (CRITICAL for sub-agents!)         ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -310,12 +280,8 @@ COMMAND_HELP = {
 ║     - h2_5: read v1, still at v1 (ok)                                        ║
 ║   Pending Conflicts: 1                                                       ║
 ║     - h2_3: conflict stored at 14:32, needs resolution                       ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'conflicts': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: conflicts                                                           ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'conflicts': _box('conflicts', """\
 ║ PURPOSE: List all pending conflicts (optionally filter by agent)             ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -329,12 +295,8 @@ COMMAND_HELP = {
 ║                                                                              ║
 ║ TO RESOLVE A CONFLICT:                                                       ║
 ║   niwa resolve <node_id> <RESOLUTION> --agent <you>          ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'check': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: check                                                               ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'check': _box('check', """\
 ║ PURPOSE: Verify database health (run this if things seem broken)             ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -350,12 +312,8 @@ COMMAND_HELP = {
 ║ ⚠️  IF NOT INITIALIZED:                                                       ║
 ║   niwa init                                                  ║
 ║   niwa add "Section Title" --agent <name>                    ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'agents': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: agents                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'agents': _box('agents', """\
 ║ PURPOSE: List all agents that have used this database                        ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -369,12 +327,8 @@ COMMAND_HELP = {
 ║ ⚠️  FOR SUB-AGENTS:                                                           ║
 ║   Check if your name is already in use! Pick a UNIQUE name.                  ║
 ║   Suggested format: <purpose>_<number> e.g. "researcher_2", "editor_3"       ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'whoami': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: whoami                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'whoami': _box('whoami', """\
 ║ PURPOSE: Quick state check + suggest unique agent name if needed             ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -390,12 +344,8 @@ COMMAND_HELP = {
 ║   $ niwa whoami                                              ║
 ║   Suggested agent name: agent_4                                              ║
 ║   (Use: --agent agent_4)                                                     ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'search': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: search                                                              ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'search': _box('search', """\
 ║ PURPOSE: Find content by keyword (when you don't know the node ID)           ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -412,12 +362,8 @@ COMMAND_HELP = {
 ║   - Node ID (for use with read/edit)                                         ║
 ║   - Title                                                                    ║
 ║   - Matching lines with line numbers                                         ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'history': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: history                                                             ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'history': _box('history', """\
 ║ PURPOSE: View version history for a node (for rollback/undo)                 ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -436,12 +382,8 @@ COMMAND_HELP = {
 ║                                                                              ║
 ║ TO ROLLBACK:                                                                 ║
 ║   niwa rollback <node_id> <version> --agent <you>            ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'rollback': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: rollback                                                            ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'rollback': _box('rollback', """\
 ║ PURPOSE: Restore a node to a previous version                                ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -458,12 +400,8 @@ COMMAND_HELP = {
 ║   - Creates a NEW version with the old content (doesn't delete history)      ║
 ║   - You can always rollback the rollback!                                    ║
 ║   - Only versions with stored content can be rolled back                     ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'dry-run': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: dry-run                                                             ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'dry-run': _box('dry-run', """\
 ║ PURPOSE: Preview what would happen if you edited (without actually editing)  ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -482,12 +420,8 @@ COMMAND_HELP = {
 ║   - Check if your edit would conflict before trying                          ║
 ║   - Verify you have the right node                                           ║
 ║   - Test without risk                                                        ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'cleanup': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: cleanup                                                             ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'cleanup': _box('cleanup', """\
 ║ PURPOSE: Clean up stale pending reads and old conflicts                      ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -502,12 +436,8 @@ COMMAND_HELP = {
 ║   - After many agents have come and gone                                     ║
 ║   - If pending_edit_count is high in `check`                                 ║
 ║   - Periodic maintenance                                                     ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'delete': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: delete                                                             ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'delete': _box('delete', """\
 ║ PURPOSE: Delete a node from the document tree                               ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -525,12 +455,8 @@ COMMAND_HELP = {
 ║                                                                              ║
 ║ NOTE:                                                                        ║
 ║   This is permanent. Check `niwa tree` first to confirm the node.            ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'move': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: move                                                               ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'move': _box('move', """\
 ║ PURPOSE: Move a node under a different parent in the tree                    ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -549,12 +475,8 @@ COMMAND_HELP = {
 ║   - Cannot move root                                                         ║
 ║   - Cannot move a node under itself                                          ║
 ║   - Cannot move a node under one of its own descendants (cycle)              ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-    'setup': """
-╔══════════════════════════════════════════════════════════════════════════════╗
-║ COMMAND: setup                                                               ║
-╠══════════════════════════════════════════════════════════════════════════════╣
+"""),
+    'setup': _box('setup', """\
 ║ PURPOSE: Set up hook integration with LLM tools (Claude Code, etc.)          ║
 ║                                                                              ║
 ║ USAGE:                                                                       ║
@@ -576,14 +498,19 @@ COMMAND_HELP = {
 ║   PreToolUse   - Warns about conflicts before Write/Edit operations          ║
 ║   PostToolUse  - Hints to sync markdown file changes to database             ║
 ║   Stop         - Reminds about unresolved conflicts                          ║
-╚══════════════════════════════════════════════════════════════════════════════╝
-""",
-}
+"""),
+})
+
+
+_NO_HELP = "No detailed help for '{}'. Run 'niwa help' for full guide.\n"
 
 
 def print_command_help(command: str):
     """Print detailed help for a specific command."""
-    if command in COMMAND_HELP:
-        print(COMMAND_HELP[command])
-    else:
-        print(f"No detailed help for '{command}'. Run 'niwa help' for full guide.")
+    text = COMMAND_HELP.get(command)
+    if text is None:
+        sys.stdout.write(_NO_HELP.format(command))
+        return
+    # Entries already end in a newline; the extra one keeps print()'s spacing
+    sys.stdout.write(text)
+    sys.stdout.write("\n")
@@ -1,84 +1,84 @@
 """niwa.core - Auto-split module"""
 
+import copy
 import json
 from pathlib import Path
 from typing import Optional, Tuple
 import sys
-
-from .niwa import Niwa
-
-
-def generate_claude_hooks_config() -> dict:
-    """Generate Claude Code hooks configuration for niwa integration."""
-    return {
-        "hooks": {
-            "PreToolUse": [
-                {
-                    "matcher": "Write|Edit",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"niwa hook --hook-event PreToolUse",
-                            "timeout": 10
-                        }
-                    ]
-                }
-            ],
-            "PostToolUse": [
-                {
-                    "matcher": "Write|Edit",
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"niwa hook --hook-event PostToolUse",
-                            "timeout": 10
-                        }
-                    ]
-                }
-            ],
-            "Stop": [
-                {
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"niwa hook --hook-event Stop",
-                            "timeout": 5
-                        }
-                    ]
-                }
-            ],
-            "SessionStart": [
-                {
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"niwa hook --hook-event SessionStart",
-                            "timeout": 5
-                        }
-                    ]
-                }
-            ],
-            "PreCompact": [
-                {
-                    "hooks": [
-                        {
-                            "type": "command",
-                            "command": f"niwa hook --hook-event PreCompact",
-                            "timeout": 5
-                        }
-                    ]
-                }
-            ]
-        }
+try:
+    import orjson
+except ImportError:  # optional: pip install "niwa[fast]"
+    orjson = None
+
+from .paths import db_exists
+
+
+# Hooks installed by `niwa setup claude`
+_CLAUDE_HOOKS_CONFIG = {
+    "hooks": {
+        "PreToolUse": [
+            {
+                "matcher": "Write|Edit",
+                "hooks": [
+                    {
+                        "type": "command",
+                        "command": "niwa hook --hook-event PreToolUse",
+                        "timeout": 10
+                    }
+                ]
+            }
+        ],
+        "PostToolUse": [
+            {
+                "matcher": "Write|Edit",
+                "hooks": [
+                    {
+                        "type": "command",
+                        "command": "niwa hook --hook-event PostToolUse",
+                        "timeout": 10
+                    }
+                ]
+            }
+        ],
+        "Stop": [
+            {
+                "hooks": [
+                    {
+                        "type": "command",
+                        "command": "niwa hook --hook-event Stop",
+                        "timeout": 5
+                    }
+                ]
+            }
+        ],
+        "SessionStart": [
+            {
+                "hooks": [
+                    {
+                        "type": "command",
+                        "command": "niwa hook --hook-event SessionStart",
+                        "timeout": 5
+                    }
+                ]
+            }
+        ],
+        "PreCompact": [
+            {
+                "hooks": [
+                    {
+                        "type": "command",
+                        "command": "niwa hook --hook-event PreCompact",
+                        "timeout": 5
+                    }
+                ]
+            }
+        ]
     }
+}
 
 
-def get_niwa_usage_guide() -> str:
-    """
-    Generate a concise usage guide for Claude to remember after compaction.
-    This is injected on SessionStart and PreCompact.
-    """
-    return """[Niwa 庭 - Collaborative Markdown Database]
+# Concise guide injected on SessionStart and PreCompact
+_NIWA_USAGE_GUIDE = """[Niwa 庭 - Collaborative Markdown Database]
 
 This project uses Niwa for collaborative markdown editing with conflict detection.
 
@@ -111,183 +111,225 @@ IMPORTANT:
   - Use --file for complex content with quotes/newlines"""
 
 
-def handle_hook_event(event_name: str, hook_input: Optional[dict] = None) -> int:
-    """
-    Handle a Claude Code hook event.
+def generate_claude_hooks_config() -> dict:
+    """Generate Claude Code hooks configuration for niwa integration."""
+    return copy.deepcopy(_CLAUDE_HOOKS_CONFIG)
 
-    Returns exit code:
-        0 = success (allow tool call)
-        2 = block (with stderr message)
+
+def get_niwa_usage_guide() -> str:
+    """
+    Generate a concise usage guide for Claude to remember after compaction.
+    This is injected on SessionStart and PreCompact.
     """
+    return _NIWA_USAGE_GUIDE
 
-    # Read hook input from stdin if not provided
-    if hook_input is None:
-        try:
-            hook_input = json.load(sys.stdin)
-        except (json.JSONDecodeError, EOFError):
-            hook_input = {}
 
-    # Check if database exists
-    db_exists = Path(".niwa/data.lmdb").exists()
+def _read_hook_input() -> dict:
+    """Parse the hook payload from stdin ({} if it's empty or malformed)."""
+    try:
+        if orjson is not None:
+            return orjson.loads(sys.stdin.buffer.read())
+        return json.load(sys.stdin)
+    except (json.JSONDecodeError, EOFError):
+        return {}
 
-    if event_name == "SessionStart":
-        # On session start, provide full context about niwa + usage guide
-        usage_guide = get_niwa_usage_guide()
 
-        if db_exists:
-            try:
-                db = Niwa()
-                health = db.get_db_health()
-                db.close()
-
-                status_info = (
-                    f"\n\n[Niwa Status] Database: {health['node_count']} nodes, "
-                    f"{health['pending_conflict_count']} pending conflicts, "
-                    f"{health['pending_edit_count']} pending edits."
-                )
-                if health['pending_conflict_count'] > 0:
-                    status_info += "\n⚠️  Run `niwa conflicts --agent <name>` to review conflicts."
-
-                output = {
-                    "hookSpecificOutput": {
-                        "hookEventName": "SessionStart",
-                        "additionalContext": usage_guide + status_info
-                    }
-                }
-                print(json.dumps(output))
-            except Exception as e:
-                # Still provide usage guide even if status check fails
-                output = {
-                    "hookSpecificOutput": {
-                        "hookEventName": "SessionStart",
-                        "additionalContext": usage_guide + f"\n\n[Niwa Status] Could not check: {e}"
-                    }
-                }
-                print(json.dumps(output))
-        else:
-            # No database yet - still provide usage guide
-            output = {
-                "hookSpecificOutput": {
-                    "hookEventName": "SessionStart",
-                    "additionalContext": usage_guide + "\n\n[Niwa Status] No database initialized. Run `niwa init` then `load <file.md>` to start."
-                }
-            }
-            print(json.dumps(output))
-        return 0
+def _write_hook_output(output: dict):
+    """Write a hook response to stdout as one line of JSON."""
+    if orjson is not None:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(output) + b"\n")
+    else:
+        print(json.dumps(output))
 
-    elif event_name == "PreCompact":
-        # Before compaction, inject usage guide so Claude remembers after context is pruned
-        usage_guide = get_niwa_usage_guide()
 
-        status_info = ""
-        if db_exists:
-            try:
-                db = Niwa()
-                health = db.get_db_health()
-                db.close()
-
-                status_info = (
-                    f"\n\n[Niwa Status at Compaction] {health['node_count']} nodes, "
-                    f"{health['pending_conflict_count']} conflicts, "
-                    f"{health['pending_edit_count']} pending edits."
-                )
-                if health['pending_conflict_count'] > 0:
-                    status_info += "\n⚠️  IMPORTANT: You have unresolved conflicts to handle after compaction!"
-            except Exception:
-                status_info = "\n\n[Niwa Status] Database exists but could not check status."
-
-        output = {
-            "hookSpecificOutput": {
-                "hookEventName": "PreCompact",
-                "additionalContext": (
-                    "[PRESERVING NIWA CONTEXT FOR POST-COMPACTION]\n\n"
-                    + usage_guide
-                    + status_info
-                    + "\n\nAfter compaction, use `niwa tree` to see current structure."
-                )
-            }
+# Only markdown edits can touch what niwa tracks
+_MD_SUFFIXES = (".md", ".markdown")
+_EDIT_TOOLS = ("Write", "Edit", "MultiEdit")
+
+
+def _read_db_counts() -> Tuple[int, int, int]:
+    """Read (nodes, pending conflicts, pending edits) through one short-lived Niwa handle."""
+    # Only load the database layer (lmdb, markdown-it, tiktoken) when
+    # there is something to inspect; setup and help never need it.
+    from .niwa import Niwa
+
+    db = Niwa()
+    try:
+        return db.get_db_health_counts()
+    finally:
+        db.close()
+
+
+# Status lines filled from get_db_health_counts()
+_SESSION_STATUS = (
+    "\n\n[Niwa Status] Database: {node_count} nodes, "
+    "{conflict_count} pending conflicts, "
+    "{edit_count} pending edits."
+).format
+_COMPACT_STATUS = (
+    "\n\n[Niwa Status at Compaction] {node_count} nodes, "
+    "{conflict_count} conflicts, "
+    "{edit_count} pending edits."
+).format
+_CONFLICT_WARNING = (
+    "[Niwa Warning] There are {conflict_count} unresolved conflict(s) in the markdown database. "
+    "Run 'niwa conflicts --agent <name>' to review."
+).format
+_CONFLICT_REMINDER = (
+    "[Niwa Reminder] There are {conflict_count} unresolved conflict(s). "
+    "Run 'niwa conflicts --agent <name>' before ending session."
+).format
+
+
+def _emit_context(event_name: str, additional_context: str):
+    """Write a hookSpecificOutput response carrying additionalContext."""
+    _write_hook_output({
+        "hookSpecificOutput": {
+            "hookEventName": event_name,
+            "additionalContext": additional_context
         }
-        print(json.dumps(output))
-        return 0
+    })
 
-    elif event_name == "PreToolUse":
-        # Before Write/Edit, check if file is tracked and has conflicts
-        tool_name = hook_input.get("tool_name", "")
-        tool_input = hook_input.get("tool_input", {})
-        file_path = tool_input.get("file_path", "")
 
-        if not db_exists or not file_path:
-            return 0  # No database or no file path, allow
+def _handle_session_start(hook_input: dict) -> int:
+    """On session start, provide full context about niwa + usage guide."""
+    if db_exists():
+        try:
+            node_count, conflict_count, edit_count = _read_db_counts()
+
+            status_info = _SESSION_STATUS(
+                node_count=node_count, conflict_count=conflict_count, edit_count=edit_count
+            )
+            if conflict_count > 0:
+                status_info += "\n⚠️  Run `niwa conflicts --agent <name>` to review conflicts."
+        except Exception as e:
+            # Still provide usage guide even if status check fails
+            status_info = f"\n\n[Niwa Status] Could not check: {e}"
+    else:
+        # No database yet - still provide usage guide
+        status_info = "\n\n[Niwa Status] No database initialized. Run `niwa init` then `load <file.md>` to start."
 
-        # Check if this file is being tracked by niwa
-        # For now, just provide context - don't block
+    _emit_context("SessionStart", _NIWA_USAGE_GUIDE + status_info)
+    return 0
+
+
+def _handle_pre_compact(hook_input: dict) -> int:
+    """Before compaction, inject usage guide so Claude remembers after context is pruned."""
+    status_info = ""
+    if db_exists():
         try:
-            db = Niwa()
-            health = db.get_db_health()
-
-            if health['pending_conflict_count'] > 0:
-                # Provide warning context
-                output = {
-                    "hookSpecificOutput": {
-                        "hookEventName": "PreToolUse",
-                        "additionalContext": f"[Niwa Warning] There are {health['pending_conflict_count']} unresolved conflict(s) in the markdown database. "
-                                           f"Run 'niwa conflicts --agent <name>' to review."
-                    }
-                }
-                print(json.dumps(output))
+            node_count, conflict_count, edit_count = _read_db_counts()
 
-            db.close()
+            status_info = _COMPACT_STATUS(
+                node_count=node_count, conflict_count=conflict_count, edit_count=edit_count
+            )
+            if conflict_count > 0:
+                status_info += "\n⚠️  IMPORTANT: You have unresolved conflicts to handle after compaction!"
         except Exception:
-            pass  # Non-blocking
-
+            status_info = "\n\n[Niwa Status] Database exists but could not check status."
+
+    _emit_context(
+        "PreCompact",
+        "[PRESERVING NIWA CONTEXT FOR POST-COMPACTION]\n\n"
+        + _NIWA_USAGE_GUIDE
+        + status_info
+        + "\n\nAfter compaction, use `niwa tree` to see current structure."
+    )
+    return 0
+
+
+def _handle_pre_tool_use(hook_input: dict) -> int:
+    """Before Write/Edit, check if file is tracked and has conflicts."""
+    tool_name = hook_input.get("tool_name", "")
+    tool_input = hook_input.get("tool_input") or {}
+    file_path = tool_input.get("file_path") or ""
+
+    # Cheap checks first: most Write/Edit calls aren't on markdown
+    if tool_name not in _EDIT_TOOLS or not file_path.endswith(_MD_SUFFIXES):
         return 0
+    if not db_exists():
+        return 0  # No database, allow
 
-    elif event_name == "PostToolUse":
-        # After Write/Edit, could sync to database
-        # For now just acknowledge
-        tool_name = hook_input.get("tool_name", "")
-        tool_input = hook_input.get("tool_input", {})
-        file_path = tool_input.get("file_path", "")
-
-        if db_exists and file_path and file_path.endswith('.md'):
-            # Provide hint about syncing
-            output = {
-                "hookSpecificOutput": {
-                    "hookEventName": "PostToolUse",
-                    "additionalContext": f"[Niwa] Markdown file modified: {file_path}. "
-                                       f"Consider running 'niwa load {file_path}' to sync changes to database."
-                }
-            }
-            print(json.dumps(output))
+    # Check if this file is being tracked by niwa
+    # For now, just provide context - don't block
+    try:
+        _, conflict_count, _ = _read_db_counts()
 
-        return 0
+        if conflict_count > 0:
+            # Provide warning context
+            _emit_context("PreToolUse", _CONFLICT_WARNING(conflict_count=conflict_count))
+    except Exception:
+        pass  # Non-blocking
 
-    elif event_name == "Stop":
-        # Before stopping, check for unresolved conflicts
-        if not db_exists:
-            return 0
+    return 0
 
-        try:
-            db = Niwa()
-            health = db.get_db_health()
-            db.close()
-
-            if health['pending_conflict_count'] > 0:
-                # Provide warning (but don't block)
-                output = {
-                    "hookSpecificOutput": {
-                        "hookEventName": "Stop",
-                        "additionalContext": f"[Niwa Reminder] There are {health['pending_conflict_count']} unresolved conflict(s). "
-                                           f"Run 'niwa conflicts --agent <name>' before ending session."
-                    }
-                }
-                print(json.dumps(output))
-        except Exception:
-            pass
 
+def _handle_post_tool_use(hook_input: dict) -> int:
+    """After Write/Edit, hint that the markdown could be synced to the database."""
+    tool_input = hook_input.get("tool_input") or {}
+    file_path = tool_input.get("file_path") or ""
+
+    if file_path.endswith(_MD_SUFFIXES) and db_exists():
+        _emit_context(
+            "PostToolUse",
+            f"[Niwa] Markdown file modified: {file_path}. "
+            f"Consider running 'niwa load {file_path}' to sync changes to database."
+        )
+
+    return 0
+
+
+def _handle_stop(hook_input: dict) -> int:
+    """Before stopping, remind about unresolved conflicts."""
+    if not db_exists():
         return 0
 
-    return 0  # Unknown event, allow
+    try:
+        _, conflict_count, _ = _read_db_counts()
+
+        if conflict_count > 0:
+            # Provide warning (but don't block)
+            _emit_context("Stop", _CONFLICT_REMINDER(conflict_count=conflict_count))
+    except Exception:
+        pass
+
+    return 0
+
+
+def _handle_unknown(hook_input: dict) -> int:
+    """Unknown event, allow."""
+    return 0
+
+
+_HOOK_HANDLERS = {
+    "SessionStart": _handle_session_start,
+    "PreCompact": _handle_pre_compact,
+    "PreToolUse": _handle_pre_tool_use,
+    "PostToolUse": _handle_post_tool_use,
+    "Stop": _handle_stop,
+}
+
+
+# Events whose handlers read the stdin payload
+_INPUT_EVENTS = frozenset({"PreToolUse", "PostToolUse"})
+
+
+def handle_hook_event(event_name: str, hook_input: Optional[dict] = None) -> int:
+    """
+    Handle a Claude Code hook event.
+
+    Returns exit code:
+        0 = success (allow tool call)
+        2 = block (with stderr message)
+    """
+
+    # Read hook input from stdin if not provided; only the tool events
+    # look at it, so the others skip parsing the payload entirely
+    if hook_input is None:
+        hook_input = _read_hook_input() if event_name in _INPUT_EVENTS else {}
+
+    return _HOOK_HANDLERS.get(event_name, _handle_unknown)(hook_input)
 
 
 def setup_claude_hooks(project_dir: str, remove: bool = False) -> Tuple[bool, str]:
@@ -317,14 +359,12 @@ def setup_claude_hooks(project_dir: str, remove: bool = False) -> Tuple[bool, st
         if 'hooks' in config:
             # Check if these are our hooks (check for 'niwa' command or 'niwa.cli' module)
             hooks = config.get('hooks', {})
-            our_hooks = False
-            for event_hooks in hooks.values():
-                for matcher_config in event_hooks:
-                    for hook in matcher_config.get('hooks', []):
-                        cmd = hook.get('command', '')
-                        if 'niwa hook' in cmd or 'niwa.cli hook' in cmd:
-                            our_hooks = True
-                            break
+            our_hooks = any(
+                'niwa hook' in cmd or 'niwa.cli hook' in cmd
+                for event_hooks in hooks.values()
+                for matcher_config in event_hooks
+                for cmd in (hook.get('command', '') for hook in matcher_config.get('hooks', []))
+            )
 
             if our_hooks:
                 del config['hooks']
@@ -344,47 +384,49 @@ def setup_claude_hooks(project_dir: str, remove: bool = False) -> Tuple[bool, st
             return True, "No hooks in settings - nothing to remove."
 
     # Setup hooks
-    hooks_config = generate_claude_hooks_config()
+    # Only read below (json.dump copies it out), so the shared dict is safe
+    hooks_config = _CLAUDE_HOOKS_CONFIG
 
     # Create .claude directory if needed
     claude_dir.mkdir(exist_ok=True)
 
-    # Merge with existing config if present
+    # Merge with existing config if present, reading and rewriting it
+    # through one handle
     if settings_file.exists():
-        try:
-            with open(settings_file, 'r') as f:
+        with open(settings_file, 'r+') as f:
+            try:
                 existing = json.load(f)
-        except json.JSONDecodeError:
-            existing = {}
-
-        # Check for existing hooks
-        if 'hooks' in existing:
-            # Merge our hooks with existing
-            for event, event_hooks in hooks_config['hooks'].items():
-                if event in existing['hooks']:
-                    # Check if we already have niwa hooks for this event
-                    existing_commands = []
-                    for matcher_config in existing['hooks'][event]:
-                        for hook in matcher_config.get('hooks', []):
-                            existing_commands.append(hook.get('command', ''))
-
-                    # Only add if not already present
-                    for new_matcher_config in event_hooks:
-                        for hook in new_matcher_config.get('hooks', []):
-                            if hook.get('command', '') not in existing_commands:
-                                existing['hooks'][event].append(new_matcher_config)
-                else:
-                    existing['hooks'][event] = event_hooks
-        else:
-            existing['hooks'] = hooks_config['hooks']
+            except json.JSONDecodeError:
+                existing = {}
+
+            # Check for existing hooks
+            if 'hooks' in existing:
+                # Merge our hooks with existing
+                for event, event_hooks in hooks_config['hooks'].items():
+                    if event in existing['hooks']:
+                        # Check if we already have niwa hooks for this event
+                        existing_commands = {
+                            hook.get('command', '')
+                            for matcher_config in existing['hooks'][event]
+                            for hook in matcher_config.get('hooks', [])
+                        }
 
-        config = existing
-    else:
-        config = hooks_config
+                        # Only add if not already present
+                        for new_matcher_config in event_hooks:
+                            for hook in new_matcher_config.get('hooks', []):
+                                if hook.get('command', '') not in existing_commands:
+                                    existing['hooks'][event].append(new_matcher_config)
+                    else:
+                        existing['hooks'][event] = event_hooks
+            else:
+                existing['hooks'] = hooks_config['hooks']
 
-    # Write config
-    with open(settings_file, 'w') as f:
-        json.dump(config, f, indent=2)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(existing, indent=2))
+    else:
+        # Fresh file: encode once and write it in a single call
+        settings_file.write_text(json.dumps(hooks_config, indent=2))
 
     return True, f"Created {settings_file} with niwa hooks"
 
@@ -676,6 +718,19 @@ ERROR_PROMPTS = {
 ║   niwa load ./docs/specification.md                          ║
 ║   niwa load /home/user/project/README.md                     ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
+""",
+    'no_title': """
+╔══════════════════════════════════════════════════════════════════════════════╗
+║ ❌ MISSING TITLE                                                            ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║ USAGE:                                                                      ║
+║   niwa add "Section Title"                          # Add under root        ║
+║   niwa add "Subsection" --parent h1_0               # Add under parent      ║
+║   niwa add "Section" "content here"                 # With inline content   ║
+║   niwa add "Section" --file content.md              # Content from file     ║
+║   niwa add "Section" --stdin                        # Content from stdin    ║
+║   niwa add "Section" --agent alice                  # Specify agent         ║
+╚══════════════════════════════════════════════════════════════════════════════╝
 """,
     'node_not_found': """
 ╔══════════════════════════════════════════════════════════════════════════════╗
@@ -56,6 +56,33 @@ class ConflictAnalysis:
     auto_merge_possible: bool
     auto_merged_content: Optional[str] = None
 
+    @classmethod
+    def from_stored(cls, stored: Dict, agent_id: str) -> 'ConflictAnalysis':
+        """Rebuild a conflict from the row saved by Niwa.store_conflict.
+
+        Only the fields resolve_conflict reads are stored; the diff and
+        agent lists come back empty.
+        """
+        return cls(
+            conflict_type=ConflictType.TRUE_CONFLICT,
+            node_id=stored['node_id'],
+            node_title=stored.get('node_title', ''),
+            your_base_version=stored.get('your_base_version', 0),
+            current_version=stored.get('current_version', 0),
+            concurrent_edits_count=0,
+            original_content='',
+            your_content=stored.get('your_content', ''),
+            current_content=stored.get('current_content', ''),
+            your_changes=[],
+            their_changes=[],
+            overlapping_regions=[],
+            your_agent_id=agent_id,
+            other_agents=[],
+            their_edit_summaries=[],
+            auto_merge_possible=stored.get('auto_merge_possible', False),
+            auto_merged_content=stored.get('auto_merged_content'),
+        )
+
     def to_llm_prompt(self) -> str:
         """Generate a structured prompt for LLM to resolve the conflict."""
 
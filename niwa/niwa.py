@@ -1,10 +1,11 @@
 """niwa.niwa - Auto-split module"""
 
 import json
+import os
 import time
 import difflib
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 try:
     import lmdb
 except ImportError:
@@ -22,6 +23,7 @@ except ImportError:
 import re
 import uuid
 
+from .agents import validate_agent_name
 from .models import ConflictAnalysis, ConflictType, EditResult
 from .tokens import count_tokens
 
@@ -137,27 +139,70 @@ class Niwa:
 
     def next_node_id(self, level: int) -> str:
         """Generate the next sequential node ID for a given level (e.g. h1_0, h1_1, h2_5)."""
+        with self.env.begin() as txn:
+            return self._next_node_id(txn, level)
+
+    def _next_node_id(self, txn, level: int) -> str:
         pattern = re.compile(rf'^h{level}_(\d+)$')
         max_idx = -1
-        with self.env.begin() as txn:
-            cursor = txn.cursor(db=self.nodes_db)
-            for key, _ in cursor:
-                m = pattern.match(key.decode())
-                if m:
-                    max_idx = max(max_idx, int(m.group(1)))
+        cursor = txn.cursor(db=self.nodes_db)
+        for key, _ in cursor:
+            m = pattern.match(key.decode())
+            if m:
+                max_idx = max(max_idx, int(m.group(1)))
         return f"h{level}_{max_idx + 1}"
 
     def find_child_by_title(self, parent_id: str, title: str) -> Optional[Dict]:
         """Find a child node under parent_id with matching title (case-insensitive)."""
-        parent = self.read_node(parent_id)
-        if not parent:
-            return None
+        with self.env.begin() as txn:
+            data = txn.get(parent_id.encode(), db=self.nodes_db)
+            if not data:
+                return None
+            return self._find_child_by_title(txn, self._deserialize(data), title)
+
+    def _find_child_by_title(self, txn, parent: Dict, title: str) -> Optional[Dict]:
+        title = title.lower()
         for child_id in parent.get('children', []):
-            child = self.read_node(child_id)
-            if child and child.get('title', '').lower() == title.lower():
-                return child
+            data = txn.get(child_id.encode(), db=self.nodes_db)
+            if data:
+                child = self._deserialize(data)
+                if child.get('title', '').lower() == title:
+                    return child
         return None
 
+    def get_ancestor_chain(self, node_id: str) -> List[Dict]:
+        """Return the nodes from the root down to node_id (inclusive)."""
+        chain = []
+        seen = set()
+        with self.env.begin() as txn:
+            while node_id and node_id not in seen:
+                seen.add(node_id)
+                data = txn.get(node_id.encode(), db=self.nodes_db)
+                if not data:
+                    break
+                node = self._deserialize(data)
+                chain.append(node)
+                node_id = node.get('parent_id')
+        chain.reverse()
+        return chain
+
+    def prepare_add(
+        self, parent_id: str, title: str
+    ) -> Tuple[Optional[Dict], Optional[Dict], Optional[str]]:
+        """
+        Look up everything `add` needs in one read transaction.
+        Returns (parent_node, existing_child_with_title, next_node_id);
+        parent_node is None (and the rest too) if the parent doesn't exist.
+        """
+        with self.env.begin() as txn:
+            data = txn.get(parent_id.encode(), db=self.nodes_db)
+            if not data:
+                return None, None, None
+            parent = self._deserialize(data)
+            existing = self._find_child_by_title(txn, parent, title)
+            next_id = self._next_node_id(txn, parent.get('level', 0) + 1)
+            return parent, existing, next_id
+
     def read_for_edit(self, node_id: str, agent_id: str) -> Optional[Dict]:
         """
         Read a node with intent to edit.
@@ -895,27 +940,54 @@ class Niwa:
 
     def export_markdown(self) -> str:
         """Export LMDB structure back to markdown."""
-        output = []
+        return "".join(self.iter_export_markdown())
+
+    def iter_export_markdown(self) -> Iterator[str]:
+        """
+        Export LMDB structure back to markdown, one chunk at a time.
 
+        Joining the chunks gives the same text as joining every block with
+        newlines and stripping the ends: leading blank blocks are dropped and
+        trailing whitespace is held back until more text follows it.
+        """
+        pending = ""
+        started = False
+        for block in self._export_blocks():
+            if started:
+                pending += "\n"
+            elif not block.strip():
+                continue
+            else:
+                block = block.lstrip()
+            body = block.rstrip()
+            if body:
+                yield pending + body
+                pending = block[len(body):]
+                started = True
+            else:
+                pending += block
+        yield "\n"
+
+    def _export_blocks(self) -> Iterator[str]:
         nodes = {n['id']: n for n in self.list_nodes()}
 
-        def export_node(node_id: str):
+        def export_node(node_id: str) -> Iterator[str]:
             if node_id not in nodes:
                 return
             node = nodes[node_id]
 
             if node['type'] == "heading":
                 prefix = "#" * node['level']
-                output.append(f"\n{prefix} {node['title']}\n")
+                yield f"\n{prefix} {node['title']}\n"
                 if node['content']:
-                    output.append(node['content'])
-                    output.append("")
+                    yield node['content']
+                    yield ""
             elif node['type'] == "paragraph":
-                output.append(node['content'])
-                output.append("")
+                yield node['content']
+                yield ""
 
             for child_id in node.get('children', []):
-                export_node(child_id)
+                yield from export_node(child_id)
 
         # Find root
         root = None
@@ -926,9 +998,7 @@ class Niwa:
 
         if root:
             for child_id in root.get('children', []):
-                export_node(child_id)
-
-        return "\n".join(output).strip() + "\n"
+                yield from export_node(child_id)
 
     # =========================================================================
     # UTILITY METHODS
@@ -1068,7 +1138,40 @@ class Niwa:
         return " · ".join(parts)
 
     def get_tree(self) -> str:
-        """Get document tree structure with token counts and AST summaries."""
+        """
+        Get document tree structure with token counts and AST summaries.
+
+        The rendered tree is cached in .niwa/tree.cache, keyed on LMDB's last
+        committed txn id, so repeated calls between writes skip the render.
+        Txn ids restart when the environment is recreated or restored, so the
+        key also carries the data file's inode and mtime.
+        """
+        try:
+            st = os.stat(self.db_path / "data.lmdb" / "data.mdb")
+        except OSError:
+            return self._render_tree()
+        cache_key = f"{self.env.info()['last_txnid']}:{st.st_ino}:{st.st_mtime_ns}"
+        cache_file = self.db_path / "tree.cache"
+        try:
+            with open(cache_file, encoding='utf-8') as f:
+                cached_key, _, cached = f.read().partition('\n')
+            if cached_key == cache_key:
+                return cached
+        except (OSError, ValueError):
+            pass
+
+        tree = self._render_tree()
+
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(f"{cache_key}\n{tree}")
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+        return tree
+
+    def _render_tree(self) -> str:
         output = ["# Document Structure", ""]
 
         nodes = {n['id']: n for n in self.list_nodes()}
@@ -1213,6 +1316,18 @@ class Niwa:
                             conflicts.append(c)
         return conflicts
 
+    def get_pending_conflict(self, agent_id: str, node_id: str) -> Optional[Dict]:
+        """Get one agent's stored conflict for node_id, or None."""
+        with self.env.begin() as txn:
+            data = txn.get(f"conflicts:{agent_id}".encode(), db=self.meta_db)
+        if not data:
+            return None
+        for c in self._deserialize(data):
+            if c.get('node_id') == node_id:
+                c['agent_id'] = agent_id
+                return c
+        return None
+
     def clear_conflict(self, agent_id: str, node_id: str):
         """Clear a resolved conflict."""
         with self.env.begin(write=True) as txn:
@@ -1281,6 +1396,26 @@ class Niwa:
 
         return health
 
+    def get_db_health_counts(self) -> Tuple[int, int, int]:
+        """
+        Get (node_count, pending_conflict_count, pending_edit_count) from one
+        short read txn - the subset of get_db_health() the hooks report.
+        """
+        with self.env.begin() as txn:
+            node_count = txn.stat(self.nodes_db)['entries']
+            pending_edit_count = txn.stat(self.pending_db)['entries']
+
+            # Conflict lists are keyed conflicts:<agent>, so seek to the prefix
+            pending_conflict_count = 0
+            cursor = txn.cursor(db=self.meta_db)
+            if cursor.set_range(b'conflicts:'):
+                for key, value in cursor:
+                    if not key.startswith(b'conflicts:'):
+                        break
+                    pending_conflict_count += len(self._deserialize(value))
+
+        return node_count, pending_conflict_count, pending_edit_count
+
     def list_all_agents(self) -> List[Dict]:
         """List all agents that have interacted with this database."""
         agents = {}
@@ -1333,20 +1468,33 @@ class Niwa:
 
     def validate_agent_name(self, agent_id: str) -> Tuple[bool, str]:
         """Validate agent name - no special chars that could cause issues."""
-        if not agent_id:
-            return False, "Agent name cannot be empty"
-        if len(agent_id) > 50:
-            return False, "Agent name too long (max 50 chars)"
-        if agent_id == "default_agent":
-            return False, "Please specify a unique agent name with --agent"
-        # Allow alphanumeric, underscore, hyphen
-        if not re.match(r'^[a-zA-Z0-9_-]+$', agent_id):
-            return False, "Agent name can only contain letters, numbers, underscore, hyphen"
-        return True, "OK"
-
-    def search_content(self, query: str, case_sensitive: bool = False) -> List[Dict]:
-        """Search for content across all nodes."""
+        return validate_agent_name(agent_id)
+
+    def search_content(
+        self, query: str, case_sensitive: bool = False, max_lines_per_node: int = 5
+    ) -> List[Dict]:
+        """Search for content across all nodes.
+
+        Each result keeps at most ``max_lines_per_node`` matching lines;
+        ``total_matches`` still counts every matching line.
+        """
+        results, _ = self.search_content_page(query, case_sensitive, max_lines_per_node)
+        return results
+
+    def search_content_page(
+        self,
+        query: str,
+        case_sensitive: bool = False,
+        max_lines_per_node: int = 5,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Dict], int]:
+        """Like search_content, but build at most ``limit`` results.
+
+        Returns (results, found): nodes past the limit are only counted, so
+        callers can still report how many matched in total.
+        """
         results = []
+        found = 0
         if not case_sensitive:
             query = query.lower()
 
@@ -1361,24 +1509,30 @@ class Niwa:
                 search_title = title if case_sensitive else title.lower()
 
                 if query in search_content or query in search_title:
-                    # Find line numbers with matches
-                    lines = content.split('\n')
+                    found += 1
+                    if limit is not None and found > limit:
+                        continue
+                    # Find line numbers with matches (lowering never adds or
+                    # drops newlines, so both splits line up)
                     matching_lines = []
-                    for i, line in enumerate(lines):
-                        search_line = line if case_sensitive else line.lower()
+                    total_matches = 0
+                    lines = zip(content.split('\n'), search_content.split('\n'))
+                    for i, (line, search_line) in enumerate(lines):
                         if query in search_line:
-                            matching_lines.append((i + 1, line[:100]))
+                            total_matches += 1
+                            if total_matches <= max_lines_per_node:
+                                matching_lines.append((i + 1, line[:100]))
 
                     results.append({
                         'node_id': node['id'],
                         'title': title,
                         'version': node['version'],
                         'match_in_title': query in search_title,
-                        'matching_lines': matching_lines[:5],  # Limit to 5 matches per node
-                        'total_matches': len(matching_lines),
+                        'matching_lines': matching_lines,
+                        'total_matches': total_matches,
                     })
 
-        return results
+        return results, found
 
     def get_node_history(self, node_id: str) -> List[Dict]:
         """Get version history for a node."""
@@ -1487,50 +1641,66 @@ class Niwa:
         Clean up pending reads older than max_age_seconds.
         Returns number of cleaned up entries.
         """
-        cleaned = 0
-        cutoff = time.time() - max_age_seconds
-
         with self.env.begin(write=True) as txn:
-            cursor = txn.cursor(db=self.pending_db)
-            keys_to_delete = []
-
-            for key, value in cursor:
-                pending = self._deserialize(value)
-                if pending.get('read_at', 0) < cutoff:
-                    keys_to_delete.append(key)
-
-            for key in keys_to_delete:
-                txn.delete(key, db=self.pending_db)
-                cleaned += 1
-
-        return cleaned
+            return self._cleanup_stale_reads(txn, time.time() - max_age_seconds)
 
     def cleanup_stale_conflicts(self, max_age_seconds: int = 86400) -> int:
         """
         Clean up stored conflicts older than max_age_seconds (default 24h).
         Returns number of cleaned up conflicts.
         """
-        cleaned = 0
-        cutoff = time.time() - max_age_seconds
+        with self.env.begin(write=True) as txn:
+            return self._cleanup_stale_conflicts(txn, time.time() - max_age_seconds)
 
+    def cleanup_stale(
+        self, read_max_age: int = 3600, conflict_max_age: int = 86400
+    ) -> Tuple[int, int]:
+        """
+        Clean up stale pending reads and stored conflicts in one write txn.
+        Returns (reads_cleaned, conflicts_cleaned).
+        """
+        now = time.time()
         with self.env.begin(write=True) as txn:
-            cursor = txn.cursor(db=self.meta_db)
-            updates = []
+            return (
+                self._cleanup_stale_reads(txn, now - read_max_age),
+                self._cleanup_stale_conflicts(txn, now - conflict_max_age),
+            )
 
-            for key, value in cursor:
-                key_str = key.decode()
-                if key_str.startswith('conflicts:'):
-                    conflicts = self._deserialize(value)
-                    new_conflicts = [c for c in conflicts if c.get('stored_at', 0) >= cutoff]
-                    removed = len(conflicts) - len(new_conflicts)
-                    if removed > 0:
-                        cleaned += removed
-                        updates.append((key, new_conflicts))
-
-            for key, new_conflicts in updates:
-                if new_conflicts:
-                    txn.put(key, self._serialize(new_conflicts), db=self.meta_db)
-                else:
-                    txn.delete(key, db=self.meta_db)
+    def _cleanup_stale_reads(self, txn, cutoff: float) -> int:
+        cleaned = 0
+        cursor = txn.cursor(db=self.pending_db)
+        keys_to_delete = []
+
+        for key, value in cursor:
+            pending = self._deserialize(value)
+            if pending.get('read_at', 0) < cutoff:
+                keys_to_delete.append(key)
+
+        for key in keys_to_delete:
+            txn.delete(key, db=self.pending_db)
+            cleaned += 1
+
+        return cleaned
+
+    def _cleanup_stale_conflicts(self, txn, cutoff: float) -> int:
+        cleaned = 0
+        cursor = txn.cursor(db=self.meta_db)
+        updates = []
+
+        for key, value in cursor:
+            key_str = key.decode()
+            if key_str.startswith('conflicts:'):
+                conflicts = self._deserialize(value)
+                new_conflicts = [c for c in conflicts if c.get('stored_at', 0) >= cutoff]
+                removed = len(conflicts) - len(new_conflicts)
+                if removed > 0:
+                    cleaned += removed
+                    updates.append((key, new_conflicts))
+
+        for key, new_conflicts in updates:
+            if new_conflicts:
+                txn.put(key, self._serialize(new_conflicts), db=self.meta_db)
+            else:
+                txn.delete(key, db=self.meta_db)
 
         return cleaned
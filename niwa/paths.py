@@ -0,0 +1,14 @@
+"""niwa.paths - Database location helpers."""
+
+import os
+
+DB_PATH = os.path.join('.niwa', 'data.lmdb')
+
+
+def db_exists() -> bool:
+    """Return True if the database file exists in the current directory."""
+    try:
+        os.stat(DB_PATH)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    return True
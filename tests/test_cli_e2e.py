@@ -9,6 +9,7 @@ Run with: pytest tests/test_cli_e2e.py -v
 
 import json
 import os
+import shutil
 import subprocess
 import tempfile
 from pathlib import Path
@@ -81,6 +82,19 @@ class TestAdd:
         assert rc == 0
         assert "NODE_ID:" in out
 
+    def test_add_prints_ancestor_path(self, db):
+        """add shows the new node's path instead of the whole tree."""
+        niwa("add", "Parent", "--agent", "a1", cwd=db)
+        niwa("add", "Sibling", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("add", "Child", "--agent", "a1", "--parent", "h1_0", cwd=db)
+        assert "Path: [root]" in out
+        assert "[h1_0] Parent > [h2_0] Child" in out
+        assert "Sibling" not in out
+
+        rc, out, err = niwa("add", "Quiet", "--agent", "a1", "--quiet", cwd=db)
+        assert "NODE_ID:" in out
+        assert "Path:" not in out
+
     def test_add_duplicate_title_warns(self, db):
         niwa("add", "Dupe", "--agent", "a1", cwd=db)
         rc, out, err = niwa("add", "Dupe", "--agent", "a2", cwd=db)
@@ -1952,6 +1966,17 @@ class TestExport:
         assert "### Bottom" in out
         assert "mid content" in out
 
+    def test_export_exact_output(self, db):
+        """Streamed export keeps the exact spacing and stripped ends."""
+        niwa("add", "Top", "--agent", "a1", cwd=db)
+        niwa("add", "Mid", "--agent", "a1", "--parent", "h1_0", cwd=db)
+        niwa("read", "h2_0", "--agent", "a1", cwd=db)
+        niwa("edit", "h2_0", "mid content", "--agent", "a1", cwd=db)
+
+        rc, out, err = niwa("export", cwd=db)
+        assert rc == 0
+        assert out == "# Top\n\n\n## Mid\n\nmid content\n\n"
+
     def test_export_empty_db(self, db):
         """Export right after init — should produce minimal output."""
         rc, out, err = niwa("export", cwd=db)
@@ -1992,6 +2017,16 @@ class TestSearch:
         assert rc == 0
         assert "UPPERCASE" in out
 
+    def test_search_caps_rendered_results(self, db):
+        """Only 10 results are shown, but the total still counts every match."""
+        for i in range(12):
+            niwa("add", f"Needle {i}", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("search", "needle", cwd=db)
+        assert rc == 0
+        assert "12 node(s) found" in out
+        assert out.count("→ Read:") == 10
+        assert "... and 2 more results" in out
+
 
 # ── Claude Hooks ────────────────────────────────────────────────────────────
 
@@ -2024,6 +2059,48 @@ class TestClaudeHooks:
         settings = json.loads(settings_path.read_text())
         assert "hooks" in settings
 
+    def test_tool_hooks_ignore_non_markdown(self, db):
+        """Write/Edit on non-markdown files produces no hook output."""
+        payload = json.dumps({"tool_name": "Write", "tool_input": {"file_path": "main.py"}})
+        for event in ("PreToolUse", "PostToolUse"):
+            result = subprocess.run(
+                ["niwa", "hook", "--hook-event", event],
+                cwd=db,
+                capture_output=True,
+                text=True,
+                input=payload,
+            )
+            assert result.returncode == 0
+            assert result.stdout == ""
+
+    def test_tool_hooks_tolerate_missing_file_path(self, db):
+        """Null or missing file_path/tool_input is a no-op, not a traceback."""
+        payloads = [
+            {"tool_name": "Write", "tool_input": {"file_path": None}},
+            {"tool_name": "Write", "tool_input": {}},
+            {"tool_name": "Write", "tool_input": None},
+            {"tool_name": "Write"},
+        ]
+        for event in ("PreToolUse", "PostToolUse"):
+            for payload in payloads:
+                result = subprocess.run(
+                    ["niwa", "hook", "--hook-event", event],
+                    cwd=db,
+                    capture_output=True,
+                    text=True,
+                    input=json.dumps(payload),
+                )
+                assert result.returncode == 0, result.stderr
+                assert result.stdout == ""
+
+    def test_session_start_reports_counts(self, db):
+        """SessionStart status line reflects the database counters."""
+        niwa("add", "Section", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("hook", "--hook-event", "SessionStart", cwd=db)
+        assert rc == 0
+        context = json.loads(out)["hookSpecificOutput"]["additionalContext"]
+        assert "Database: 2 nodes, 0 pending conflicts, 0 pending edits." in context
+
 
 # ── History ─────────────────────────────────────────────────────────────────
 
@@ -2334,6 +2411,35 @@ class TestTokenCounting:
         assert rc == 0
         assert "tok" in out
 
+    def test_tree_cache_tracks_writes(self, db):
+        """Cached tree output is reused until the next write, then refreshed."""
+        niwa("add", "Cached", "--agent", "a1", cwd=db)
+        _, first, _ = niwa("tree", cwd=db)
+        assert (db / ".niwa" / "tree.cache").exists()
+        _, second, _ = niwa("tree", cwd=db)
+        assert second == first
+
+        niwa("add", "Fresh", "--agent", "a1", cwd=db)
+        _, third, _ = niwa("tree", cwd=db)
+        assert "Fresh" in third
+
+    def test_tree_cache_survives_db_recreate(self, tmp_path):
+        """A recreated database restarts txn ids; tree must not reuse the old cache."""
+        (tmp_path / "a.md").write_text("# Alpha\n\nfirst\n")
+        (tmp_path / "b.md").write_text("# Bravo\n\nsecond\n")
+        niwa("init", ".", cwd=tmp_path)
+        niwa("load", str(tmp_path / "a.md"), cwd=tmp_path)
+        _, out, _ = niwa("tree", cwd=tmp_path)
+        assert "Alpha" in out
+
+        shutil.rmtree(tmp_path / ".niwa" / "data.lmdb")
+        niwa("init", ".", cwd=tmp_path)
+        niwa("load", str(tmp_path / "b.md"), cwd=tmp_path)
+        rc, out, _ = niwa("tree", cwd=tmp_path)
+        assert rc == 0
+        assert "Bravo" in out
+        assert "Alpha" not in out
+
     def test_tree_shows_ast_summary(self, db):
         """Tree output includes AST summary (e.g., paragraph and code indicators)."""
         niwa("add", "Rich Section", "--agent", "a1", cwd=db)
@@ -2728,6 +2834,15 @@ class TestErrorPaths:
         rc, out, err = niwa("resolve", "h1_0", "MANUAL_MERGE", "--agent", "a1", cwd=db)
         assert "REQUIRES CONTENT" in out or "content" in out.lower()
 
+    def test_quiet_skips_usage_guide(self, db):
+        """--quiet prints the error box without the full usage guide."""
+        niwa("add", "Section", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("resolve", "h1_0", "INVALID", "--agent", "a1", cwd=db)
+        assert "LLM AGENT INSTRUCTION GUIDE" in out
+        rc, out, err = niwa("resolve", "h1_0", "INVALID", "--agent", "a1", "--quiet", cwd=db)
+        assert "INVALID RESOLUTION" in out
+        assert "LLM AGENT INSTRUCTION GUIDE" not in out
+
     def test_rollback_nonexistent_version(self, db):
         """Rollback to a version that doesn't exist."""
         niwa("add", "Section", "V1", "--agent", "a1", cwd=db)
@@ -2756,6 +2871,12 @@ class TestErrorPaths:
         rc, out, err = niwa("foobar", cwd=db)
         assert "foobar" in out or rc != 0
 
+    def test_unknown_command_without_db(self, tmp_path):
+        """Unknown commands are reported even before init."""
+        rc, out, err = niwa("foobar", cwd=tmp_path)
+        assert "You entered: 'foobar'" in out
+        assert "NOT INITIALIZED" not in out
+
     def test_add_duplicate_title(self, db):
         """Adding a node with duplicate title shows warning."""
         niwa("add", "Same Title", "--agent", "a1", cwd=db)
@@ -2824,6 +2945,24 @@ class TestAgentValidation:
         rc, out, err = niwa("read", "h1_0", "--agent", long_name, cwd=db)
         assert "INVALID AGENT NAME" in out
 
+    def test_agent_name_trailing_newline(self, db):
+        """A trailing newline doesn't slip past the name pattern."""
+        niwa("add", "Section", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("read", "h1_0", "--agent", "agent1\n", cwd=db)
+        assert "INVALID AGENT NAME" in out
+
+    def test_explicit_default_agent_same_as_omitted(self, db):
+        """--agent default_agent behaves like leaving --agent out."""
+        niwa("add", "Section", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("read", "h1_0", "--agent", "default_agent", cwd=db)
+        assert rc == 0
+        assert "INVALID AGENT NAME" not in out
+        assert 'Your agent "default_agent"' in out
+
+        rc, out, err = niwa("whoami", "--agent", "default_agent", cwd=db)
+        assert rc == 0
+        assert "agent_" in out
+
     def test_agent_name_spaces(self, db):
         """Agent names with spaces are rejected."""
         niwa("add", "Section", "--agent", "a1", cwd=db)
@@ -3004,6 +3143,42 @@ class TestCheck:
         assert "Nodes:" in out
 
 
+# ── JSON Output ──────────────────────────────────────────────────────────────
+
+
+class TestJsonOutput:
+    def test_status_json(self, db):
+        """status --json returns the agent status dict."""
+        niwa("add", "Section", "Content", "--agent", "a1", cwd=db)
+        niwa("read", "h1_0", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("status", "--agent", "a1", "--json", cwd=db)
+        assert rc == 0
+        data = json.loads(out)
+        assert [pr["node_id"] for pr in data["pending_reads"]] == ["h1_0"]
+
+    def test_check_json(self, db):
+        """check --json returns the health dict."""
+        rc, out, err = niwa("check", "--json", cwd=db)
+        assert rc == 0
+        data = json.loads(out)
+        assert data["initialized"] is True
+        assert data["has_root"] is True
+
+    def test_search_json(self, db):
+        """search --json returns the result list."""
+        niwa("add", "Authentication", "--agent", "a1", cwd=db)
+        rc, out, err = niwa("search", "auth", "--json", cwd=db)
+        assert rc == 0
+        assert [r["node_id"] for r in json.loads(out)] == ["h1_0"]
+
+    def test_whoami_json_suggests_name(self, db):
+        """whoami --json without an agent returns a suggestion."""
+        rc, out, err = niwa("whoami", "--json", cwd=db)
+        data = json.loads(out)
+        assert data["agent"] is None
+        assert data["suggested_name"]
+
+
 # ── Title and Summarize ──────────────────────────────────────────────────────
 
 